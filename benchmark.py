@@ -0,0 +1,117 @@
+"""
+Offline benchmark of the full bot against recorded cassettes.
+
+Record a run once (with network access and the usual secrets):
+
+    CASSETTE_DIR=cassettes python main.py
+
+and replay it as often as needed, without network, for every MAX_WORKERS setting to compare:
+
+    python benchmark.py cassettes --workers 1,4 --latency 0.5
+
+Every mode runs main.py as a subprocess against replay_server.py, with a fresh cache
+directory, and reports questions per minute, per-stage p50/p95 from the run's spans and
+the number of requests per provider.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from replay_server import start_replay_server
+
+
+def run_bot(base_url: str, workers: int, extra_env: dict) -> dict:
+    """
+    Run main.py once against {base_url} with MAX_WORKERS={workers} and return its spans and wall time.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        span_log = os.path.join(work_dir, "spans.jsonl")
+        env = dict(
+            os.environ,
+            MAX_WORKERS=str(workers),
+            METACULUS_URL=base_url,
+            LLM_PROXY_URL=f"{base_url}/proxy/anthropic/v1/messages/",
+            PERPLEXITY_API_URL=f"{base_url}/chat/completions",
+            ASKNEWS_API_URL=base_url,
+            ASKNEWS_TOKEN_URL=f"{base_url}/oauth2/token",
+            BOT_CACHE_DIR=os.path.join(work_dir, "cache"),
+            SPAN_LOG_PATH=span_log,
+            METACULUS_TOKEN=os.getenv("METACULUS_TOKEN", "replay"),
+            PERPLEXITY_API_KEY=os.getenv("PERPLEXITY_API_KEY", "replay"),
+            ASKNEWS_CLIENT_ID=os.getenv("ASKNEWS_CLIENT_ID", "replay"),
+            ASKNEWS_SECRET=os.getenv("ASKNEWS_SECRET", "replay"),
+            **extra_env,
+        )
+        env.pop("CASSETTE_DIR", None)
+        start = time.monotonic()
+        completed = subprocess.run(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")],
+            env=env,
+            cwd=work_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        wall_time = time.monotonic() - start
+        spans = []
+        if os.path.exists(span_log):
+            with open(span_log) as f:
+                spans = [json.loads(line) for line in f if line.strip()]
+    if completed.returncode != 0:
+        print(f"main.py exited with {completed.returncode}:\n{completed.stderr[-2000:]}")
+    return {"wall_time": wall_time, "spans": spans, "returncode": completed.returncode}
+
+
+def print_report(workers: int, result: dict) -> None:
+    spans = result["spans"]
+    questions = sum(span["name"] == "question" for span in spans)
+    print(f"\n== MAX_WORKERS={workers}: {questions} questions in {result['wall_time']:.1f}s"
+          f" ({questions / result['wall_time'] * 60:.2f} questions/minute)")
+
+    durations = {}
+    for span in spans:
+        durations.setdefault(span["name"], []).append(span["duration"])
+    print(f"{'span':<32} {'count':>6} {'p50 s':>8} {'p95 s':>8}")
+    for name, values in sorted(durations.items()):
+        print(f"{name:<32} {len(values):>6} {np.percentile(values, 50):>8.2f} {np.percentile(values, 95):>8.2f}")
+
+    requests_by_provider = {}
+    for span in spans:
+        if span["name"].startswith("http."):
+            provider = span["name"][len("http."):]
+            requests_by_provider[provider] = requests_by_provider.get(provider, 0) + 1 + span.get("retries", 0)
+    print(f"Requests: {requests_by_provider}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassette_dir")
+    parser.add_argument("--workers", default="1,4", help="comma separated MAX_WORKERS values to compare")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean injected delay per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--env", action="append", default=[], help="extra NAME=VALUE for main.py, e.g. LLM_STREAMING=1")
+    args = parser.parse_args()
+
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    server = start_replay_server(
+        args.cassette_dir, latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate
+    )
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        for workers in [int(value) for value in args.workers.split(",")]:
+            print_report(workers, run_bot(base_url, workers, extra_env))
+    finally:
+        server.shutdown()
+    print(f"\nReplay server: {({name: count for name, count in server.stats.items() if name != 'lock'})}")
+
+
+if __name__ == "__main__":
+    main()
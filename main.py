@@ -1,23 +1,124 @@
 #CELL 1
+# Importing this module has no side effects: the bot runs from main(), AskNews and numpy
+# are only imported by the functions that need them.
+from __future__ import annotations
+
+import collections
+import contextlib
 import datetime
+import hashlib
 import json
 import os
+import queue
+import random
 import requests
 import re
-from asknews_sdk import AskNewsSDK
+import sys
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from email.utils import parsedate_to_datetime
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 import textwrap
+import threading
 import time
-import anthropic
-import numpy as np
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
 ## CONSTANTS
 SUBMIT_PREDICTION = True # set to True to publish your predictions to Metaculus
 FORECAST_TOURNAMENT = True # set to True to forecast all tournament questions
-GET_NEWS = True # set to True to enable AskNews after entering ASKNEWS secrets
+GET_NEWS = os.getenv("GET_NEWS", "1") == "1" # AskNews research, needs the ASKNEWS secrets; GET_NEWS=0 turns it off
 num_runs=5 # number of times to run the LLM
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4")) # number of questions forecast concurrently, 1 = one after another
+# Maximum number of requests in flight per provider, shared by all concurrently forecast questions
+PROVIDER_CONCURRENCY = {
+    "metaculus": 4,
+    "llm_proxy": 6,
+    "perplexity": 3,
+    "asknews": 2,
+}
+# Token bucket per provider: sustained requests per second and the burst allowed on top of it
+PROVIDER_RATE_LIMITS = {
+    "metaculus": {"rate": 2.0, "burst": 4},
+    "llm_proxy": {"rate": 1.0, "burst": 6},
+    "perplexity": {"rate": 0.8, "burst": 3},
+    "asknews": {"rate": 0.5, "burst": 2},
+}
+RETRY_MAX_ATTEMPTS = 6 # attempts per request before a throttled or failing response is handed back
+RETRY_BASE_DELAY = 1 # seconds, doubled on every retry and jittered
+RETRY_MAX_DELAY = 60 # seconds, upper bound of the backoff unless the provider sends Retry-After
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Research providers whose failures open a circuit breaker, so later questions skip them straight to the fallback
+CIRCUIT_BREAKER_PROVIDERS = ("perplexity", "asknews")
+CIRCUIT_BREAKER_THRESHOLD = 3 # consecutive failures or timeouts that open the breaker
+CIRCUIT_BREAKER_COOLDOWN = 15 * 60 # seconds an open breaker waits before a probe call is let through
+SPAN_LOG_PATH = os.getenv("SPAN_LOG_PATH", "spans.jsonl") # timing spans of the run, one JSON object per line
+HTTP_TIMEOUT = (10, 300) # (connect, read) timeout in seconds for every outbound request
+HTTP_POOL_SIZE = 16 # keep-alive connections kept open per host
+# set to skip the on-disk LLM response cache; always skipped while recording, so cassettes hold every LLM call
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS") == "1" or bool(os.getenv("CASSETTE_DIR"))
+LLM_CACHE_TTL = 24 * 60 * 60 # seconds a cached LLM response can be replayed
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024 # least recently used responses are evicted above this size
+LLM_CACHE_SCAN_EVERY = 100 # cache writes between scans of the cache directory for expired responses
+PROMPT_CACHING = True # send the prompt context shared by the ensemble runs as an Anthropic prompt-cache prefix
+LLM_STREAMING = os.getenv("LLM_STREAMING") == "1" # stream LLM proxy answers and extract the final answer as soon as it is complete
+LLM_HEDGING = os.getenv("LLM_HEDGING") == "1" # fire a duplicate of slow idempotent LLM calls and use whichever answers first
+LLM_HEDGE_PERCENTILE = 95 # a call is hedged once it runs longer than this percentile of recent latencies of its call type
+LLM_HEDGE_MIN_SAMPLES = 10 # latencies to observe before hedging starts
+LLM_HEDGE_BUDGET = 10 # maximum number of hedged (duplicate) calls per run
+# Seconds a research branch may take before its "nothing found" fallback is used instead
+RESEARCH_STAGE_TIMEOUTS = {
+    "summary_report": 240,
+    "prior_prompt": 120,
+    "prior_prompt2": 120,
+    "prior_info": 180,
+    "prior_info2": 180,
+    "meta_id": 120,
+    "meta_assistant": 60,
+}
+# Provider a research branch mostly waits on; a branch running out of time counts as a failure of its circuit breaker
+RESEARCH_STAGE_PROVIDERS = {
+    "summary_report": "asknews",
+    "prior_info": "perplexity",
+    "prior_info2": "perplexity",
+    "meta_id": "perplexity",
+}
 ONLY_NEW=1 # Only predict on new questions
+DAEMON_MODE = os.getenv("DAEMON_MODE") == "1" # keep running and poll the tournament instead of a single pass
+DAEMON_POLL_INTERVAL = int(os.getenv("DAEMON_POLL_INTERVAL", "30")) # seconds between two tournament polls
+DAEMON_MAX_RUNTIME = int(os.getenv("DAEMON_MAX_RUNTIME", "0")) # seconds after which the daemon stops, 0 = never
+BATCH_SUBMISSIONS = True # collect forecasts and post them in bulk, comments are posted in the background
+SUBMISSION_BATCH_SIZE = 10 # number of queued forecasts that triggers a bulk submission
+SUBMISSION_MAX_DELAY = 60 # seconds a queued forecast waits for its batch to fill before it is posted anyway
+CACHE_DIR = os.getenv("BOT_CACHE_DIR", ".cache") # local state shared between runs
+COMMUNITY_SNAPSHOT_TTL = 6 * 60 * 60 # seconds a Quarterly Cup snapshot on disk stays valid
+CHECKPOINT_TTL = 24 * 60 * 60 # seconds the finished stages of an interrupted question can be resumed
+LEDGER_TTL = 24 * 60 * 60 # seconds before the local ledger of submitted forecasts is re-verified against the API
+ASKNEWS_CACHE_TTL = 60 * 60 # seconds a news retrieval is shared by questions with the same (date-less) title
+NEWS_CONTEXT_TOKEN_BUDGET = 6000 # approximate tokens of articles handed to the news summarizer
+NEWS_DUPLICATE_SIMILARITY = 0.7 # estimated Jaccard similarity above which two articles count as the same story
+NEWS_RECENCY_HALF_LIFE = 7 # days after which an article's recency score has halved
+CDF_MIN_STEP = 5e-05 # smallest increase Metaculus accepts between two consecutive CDF points
+NUMERIC_AGGREGATION = "percentile_mean" # how numeric runs are pooled: "percentile_mean" or "mixture" (average of the CDFs)
+ADAPTIVE_ENSEMBLE = False # stop adding runs (between ENSEMBLE_MIN_RUNS and num_runs) once the runs agree
+ENSEMBLE_MIN_RUNS = 3
+# Largest spread between runs that counts as agreement: percentage points for binary,
+# L1 distance of the option probabilities for multiple choice, mean absolute CDF distance for numeric
+ENSEMBLE_TOLERANCE = {
+    "binary": 5,
+    "multiple_choice": 0.1,
+    "numeric": 0.03,
+}
 
 # Environment variables
 METACULUS_TOKEN = os.getenv("METACULUS_TOKEN")
+# Base URLs can be pointed at replay_server.py to run the bot offline
+METACULUS_URL = os.getenv("METACULUS_URL", "https://www.metaculus.com")
+PERPLEXITY_API_URL = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
+ASKNEWS_API_URL = os.getenv("ASKNEWS_API_URL", "https://api.asknews.app")
+ASKNEWS_TOKEN_URL = os.getenv("ASKNEWS_TOKEN_URL", "https://auth.asknews.app/oauth2/token")
+CASSETTE_DIR = os.getenv("CASSETTE_DIR") # record every HTTP interaction into cassettes for replay_server.py
 if GET_NEWS == True:
     ASKNEWS_CLIENT_ID = os.getenv("ASKNEWS_CLIENT_ID")
     ASKNEWS_SECRET = os.getenv("ASKNEWS_SECRET")
@@ -368,6 +469,8 @@ The news articles are:
 """
 
 ## Fact checker
+# The context prompts are the same for every run of a question and are sent as a cached
+# prompt prefix; the *_TASK prompts carry the rationale of the run.
 
 PROMPT_FACT_CHECKER = """
 IMPORTANT: Assume that today is {today}.
@@ -393,11 +496,7 @@ nevertheless be provided. Do not answer 0% in this case!
 
 7. Did the assisstants agree or disagree? Did the forecaster handle major disagreement with care by updating less strongly on the assistants' information?
 
-Here is the forecaster's rationale:
-
-{rationale}
-
-Here is more information that the forecaster had available.
+Here is the information that the forecaster had available.
 
 Background:
 {background}
@@ -429,6 +528,13 @@ Assistant 2:
 Your news sources say:
 {summary_report}
 
+"""
+
+PROMPT_FACT_CHECKER_TASK = """
+Here is the forecaster's rationale:
+
+{rationale}
+
 Critically evaluate the forecaster's prediction. IMPORTANT: Be sure to stay consistent with old predictions for related questions!
 The sum of questions that are both mututally exclusive and exhaustive must be 100%!
 
@@ -466,11 +572,7 @@ nevertheless be provided. Do not answer 0% in this case!
 
 7. Did the assisstants agree or disagree? Did the forecaster handle major disagreement with care by updating less strongly on the assistants' information?
 
-Here is the forecaster's rationale:
-
-{rationale}
-
-Here is more information that the forecaster had available.
+Here is the information that the forecaster had available.
 
 Background:
 {background}
@@ -501,6 +603,13 @@ Assistant 2:
 Your news sources say:
 {summary_report}
 
+"""
+
+PROMPT_FACT_CHECKER_NUMERIC_TASK = """
+Here is the forecaster's rationale:
+
+{rationale}
+
 Critically evaluate the forecaster's prediction.
 
 At the end, do the following without further commentary! Do not put "%" after the numbers!
@@ -562,11 +671,7 @@ nevertheless be provided. Do not answer 0% in this case!
 
 8. IMPORTANT: Do the probabilities sum up to 100%? They must! Only provide probabilities that sum up to 100%!
 
-Here is the forecaster's rationale:
-
-{rationale}
-
-Here is more information that the forecaster had available.
+Here is the information that the forecaster had available.
 
 Background:
 {background}
@@ -597,6 +702,13 @@ Assistant 2:
 Your news sources say:
 {summary_report}
 
+"""
+
+PROMPT_FACT_CHECKER_MC_TASK = """
+Here is the forecaster's rationale:
+
+{rationale}
+
 Critically evaluate the forecaster's prediction.
 
 At the end, do the following without further commentary!
@@ -633,15 +745,819 @@ IMPORTANT: Do not report anything else! Do not include reasoning! Your response
 #CELL 2
 
 AUTH_HEADERS = {"headers": {"Authorization": f"Token {METACULUS_TOKEN}"}}
-API_BASE_URL = "https://www.metaculus.com/api"
-API_BASE_URL2 = "https://www.metaculus.com/api2"
+API_BASE_URL = f"{METACULUS_URL}/api"
+API_BASE_URL2 = f"{METACULUS_URL}/api2"
+
+_provider_semaphores = {
+    provider: threading.BoundedSemaphore(limit)
+    for provider, limit in PROVIDER_CONCURRENCY.items()
+}
+
+RUN_ID = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+run_spans = []  # every span of this run, see span
+_span_local = threading.local()
+_span_lock = threading.Lock()
+_span_log_started = False
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Time the enclosed block and record it as a span: {name}, {attributes}, start, duration and
+    error, plus whatever the block adds to the yielded dict (status, bytes, tokens, ...).
+    Spans are kept in run_spans and appended to SPAN_LOG_PATH as JSON lines.
+    """
+    record = {"run_id": RUN_ID, "name": name, **attributes, "start": time.time()}
+    parent = getattr(_span_local, "current", None)
+    _span_local.current = record
+    start = time.monotonic()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration"] = time.monotonic() - start
+        _span_local.current = parent
+        emit_span(record)
+
+def current_span() -> dict | None:
+    """
+    The innermost open span of this thread, so nested helpers can annotate it.
+    """
+    return getattr(_span_local, "current", None)
+
+def traced(function, name: str, **attributes):
+    """
+    Wrap {function} so every call runs inside span({name}, **{attributes}).
+    """
+    def run(*args, **kwargs):
+        with span(name, **attributes):
+            return function(*args, **kwargs)
+    return run
+
+def emit_span(record: dict) -> None:
+    global _span_log_started
+    with _span_lock:
+        run_spans.append(record)
+        try:
+            # The log holds a single run, it is started fresh by the first span
+            with open(SPAN_LOG_PATH, "a" if _span_log_started else "w") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+            _span_log_started = True
+        except OSError as e:
+            print(f"Could not write span: {e}")
+
+def critical_path(question_id: int) -> list[dict]:
+    """
+    Chain of spans that determined how long {question_id} took: starting from the stage that
+    finished last, repeatedly step to the dependency ("deps") that finished last.
+    """
+    spans = {
+        record["key"]: record
+        for record in run_spans
+        if record.get("question_id") == question_id and "key" in record and record["key"] != "question"
+    }
+    if not spans:
+        return []
+    end = lambda record: record["start"] + record["duration"]
+    path = [max(spans.values(), key=end)]
+    while True:
+        deps = [spans[dep] for dep in path[-1].get("deps", ()) if dep in spans]
+        if not deps:
+            break
+        path.append(max(deps, key=end))
+    return path[::-1]
+
+def print_run_report() -> None:
+    """
+    Print p50/p95 wall time, errors, retries and tokens per span name, and the critical path of every question.
+    """
+    import numpy as np
+    with _span_lock:
+        spans = list(run_spans)
+    if not spans:
+        return
+    by_name = {}
+    for record in spans:
+        by_name.setdefault(record["name"], []).append(record)
+    print(f"{'span':<32} {'count':>6} {'p50 s':>8} {'p95 s':>8} {'errors':>7} {'retries':>8} {'in tok':>9} {'out tok':>9}")
+    for name, records in sorted(by_name.items()):
+        durations = [record["duration"] for record in records]
+        print(
+            f"{name:<32} {len(records):>6} {np.percentile(durations, 50):>8.2f} {np.percentile(durations, 95):>8.2f}"
+            f" {sum('error' in record for record in records):>7} {sum(record.get('retries', 0) for record in records):>8}"
+            f" {sum(record.get('input_tokens', 0) for record in records):>9} {sum(record.get('output_tokens', 0) for record in records):>9}"
+        )
+    for question_id in sorted({record["question_id"] for record in spans if record["name"] == "question"}):
+        path = critical_path(question_id)
+        if path:
+            total = path[-1]["start"] + path[-1]["duration"] - path[0]["start"]
+            steps = " -> ".join(f"{record['key']} {record['duration']:.1f}s" for record in path)
+            print(f"Question {question_id} critical path ({total:.1f}s): {steps}")
+
+@contextlib.contextmanager
+def provider_slot(provider: str):
+    """
+    Hold one of the PROVIDER_CONCURRENCY slots of {provider} for the duration of a request.
+    """
+    semaphore = _provider_semaphores[provider]
+    with semaphore:
+        yield
+
+class TokenBucket:
+    """
+    Rate limiter refilled with {rate} tokens per second up to {burst}. acquire() blocks until a
+    token is free; pause() holds back every caller, e.g. after the provider answered 429.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait_time)
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+_provider_buckets = {
+    provider: TokenBucket(limits["rate"], limits["burst"])
+    for provider, limits in PROVIDER_RATE_LIMITS.items()
+}
+
+def backoff_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY) -> float:
+    """
+    Exponential backoff with full jitter for retry number {attempt} (starting at 1).
+    """
+    return random.uniform(0, min(RETRY_MAX_DELAY, base_delay * 2 ** (attempt - 1)))
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Seconds to wait from a Retry-After header, given either as seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    True for dropped connections and timeouts of requests, or of httpx (used by the AskNews SDK).
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    # httpx can only have raised if it is already imported
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, httpx.TransportError)
+
+# Per thread: .wire_seconds, the time on the wire of the last answered attempt, and .on_slot,
+# an optional callback run whenever an attempt has been given its provider slot
+_provider_call_state = threading.local()
+
+def provider_call(provider: str, fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) against {provider} once its token bucket and concurrency slot allow it.
+    Throttled or unavailable answers (RETRYABLE_STATUS_CODES) and dropped connections are retried
+    with backoff_delay, or after Retry-After when the provider sends one; a 429 also pauses every
+    other caller of the provider. After RETRY_MAX_ATTEMPTS the last response is returned (or the
+    last error raised) to the caller.
+    """
+    bucket = _provider_buckets[provider]
+    for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+        bucket.acquire()
+        retry_after = None
+        try:
+            with provider_slot(provider):
+                on_slot = getattr(_provider_call_state, "on_slot", None)
+                if on_slot:
+                    on_slot()
+                started = time.monotonic()
+                result = fn(*args, **kwargs)
+                _provider_call_state.wire_seconds = time.monotonic() - started
+        except Exception as e:
+            reason = e
+            connection_error = is_connection_error(e)
+            # The AskNews SDK raises APIError with its HTTP response attached as e.response
+            response = None if connection_error else getattr(e, "response", None)
+            status = getattr(response, "status_code", None)
+            if not (connection_error or status in RETRYABLE_STATUS_CODES) or attempt == RETRY_MAX_ATTEMPTS:
+                raise
+            if response is not None:
+                retry_after = parse_retry_after(response.headers.get("retry-after") or response.headers.get("Retry-After"))
+        else:
+            status, reason = getattr(result, "status_code", None), None
+            if status not in RETRYABLE_STATUS_CODES or attempt == RETRY_MAX_ATTEMPTS:
+                return result
+            retry_after = parse_retry_after(result.headers.get("Retry-After"))
+            result.close()
+
+        delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        if current_span() is not None:
+            current_span()["retries"] = attempt
+        if status == 429:
+            bucket.pause(delay)
+        print(f"{provider} request failed ({status or reason}), retrying in {delay:.1f}s (attempt {attempt}/{RETRY_MAX_ATTEMPTS})")
+        time.sleep(delay)
+
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+def get_http_session(url: str) -> requests.Session:
+    """
+    Return the shared keep-alive session for the host of {url}, creating it on first use.
+    """
+    host = urlsplit(url).netloc
+    with _http_sessions_lock:
+        session = _http_sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_sessions[host] = session
+        return session
+
+def http_request(provider: str, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Send a request through the pooled session of the target host, scheduled and retried
+    by provider_call. Uses HTTP_TIMEOUT unless a timeout is given.
+    """
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    parts = urlsplit(url)
+    with span(f"http.{provider}", method=method, url=f"{parts.netloc}{parts.path}") as record:
+        response = provider_call(provider, get_http_session(url).request, method, url, **kwargs)
+        record["status"] = response.status_code
+        # A streamed body is still unread here, so only its announced length is known
+        if kwargs.get("stream") and not CASSETTE_DIR:
+            record["bytes"] = int(response.headers.get("Content-Length", 0))
+        else:
+            record["bytes"] = len(response.content)
+        if CASSETTE_DIR:
+            record_cassette(provider, method, url, kwargs, response)
+        return response
+
+_cassette_lock = threading.Lock()
+
+def record_cassette(provider: str, method: str, url: str, kwargs: dict, response: requests.Response, text: str | None = None) -> None:
+    """
+    Append the interaction to {CASSETTE_DIR}/{provider}.jsonl for replay_server.py.
+    Request headers are left out, so no credentials end up in the cassette. {text} replaces
+    response.text for streamed responses, whose body has already been consumed.
+    """
+    # The prepared request URL includes the encoded query parameters
+    parts = urlsplit(str(response.request.url))
+    interaction = {
+        "method": method,
+        "path": parts.path + (f"?{parts.query}" if parts.query else ""),
+        "body": kwargs.get("json"),
+        "status": response.status_code,
+        "content_type": response.headers.get("Content-Type", ""),
+        "response": response.text if text is None else text,
+    }
+    with _cassette_lock:
+        try:
+            os.makedirs(CASSETTE_DIR, exist_ok=True)
+            with open(os.path.join(CASSETTE_DIR, f"{provider}.jsonl"), "a") as f:
+                f.write(json.dumps(interaction) + "\n")
+        except OSError as e:
+            print(f"Could not record cassette: {e}")
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling a provider whose circuit breaker is open.
+    """
+
+CIRCUIT_BREAKER_PATH = os.path.join(CACHE_DIR, "circuit_breakers.json")
+_circuit_breakers = None  # provider -> {"state": closed|open|half_open, "failures": n, "opened_at": time}, loaded on first use
+_circuit_probes = set()  # providers with a half-open probe call in flight
+_circuit_breakers_lock = threading.Lock()
+
+def _load_circuit_breakers() -> dict:
+    # Breaker state is kept in the cache directory, so the runs of one cron window share it
+    global _circuit_breakers
+    if _circuit_breakers is None:
+        try:
+            with open(CIRCUIT_BREAKER_PATH) as f:
+                _circuit_breakers = json.load(f)
+        except (OSError, ValueError):
+            _circuit_breakers = {}
+    return _circuit_breakers
+
+def _set_circuit_breaker(provider: str, breaker: dict, reason: str) -> None:
+    # Caller holds _circuit_breakers_lock
+    breakers = _load_circuit_breakers()
+    old_state = breakers.get(provider, {}).get("state", "closed")
+    breakers[provider] = breaker
+    if breaker["state"] != old_state:
+        print(f"Circuit breaker {provider}: {old_state} -> {breaker['state']} ({reason})")
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(f"{CIRCUIT_BREAKER_PATH}.tmp", "w") as f:
+            json.dump(breakers, f)
+        os.replace(f"{CIRCUIT_BREAKER_PATH}.tmp", CIRCUIT_BREAKER_PATH)
+    except OSError as e:
+        print(f"Could not write circuit breaker state: {e}")
+
+def circuit_call(provider: str, fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) behind the circuit breaker of {provider}. After CIRCUIT_BREAKER_THRESHOLD
+    consecutive failures the breaker opens and calls raise CircuitOpenError right away; once
+    CIRCUIT_BREAKER_COOLDOWN has passed a single probe call decides whether it closes again.
+    Providers not in CIRCUIT_BREAKER_PROVIDERS are called directly.
+    """
+    if provider not in CIRCUIT_BREAKER_PROVIDERS:
+        return fn(*args, **kwargs)
+
+    with _circuit_breakers_lock:
+        breaker = _load_circuit_breakers().get(provider, {"state": "closed", "failures": 0, "opened_at": 0})
+        if breaker["state"] != "closed":
+            if provider in _circuit_probes or time.time() < breaker["opened_at"] + CIRCUIT_BREAKER_COOLDOWN:
+                raise CircuitOpenError(f"Circuit breaker for {provider} is open")
+            if breaker["state"] == "open":
+                breaker = dict(breaker, state="half_open")
+                _set_circuit_breaker(provider, breaker, "cool-down over, probing")
+            _circuit_probes.add(provider)
+
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        record_circuit_failure(provider, str(e))
+        raise
+
+    with _circuit_breakers_lock:
+        _circuit_probes.discard(provider)
+        breaker = _load_circuit_breakers().get(provider, {"state": "closed", "failures": 0, "opened_at": 0})
+        if breaker["state"] != "closed" or breaker["failures"]:
+            _set_circuit_breaker(provider, {"state": "closed", "failures": 0, "opened_at": 0}, "call succeeded")
+    return result
+
+def record_circuit_failure(provider: str, reason: str) -> None:
+    """
+    Count a failed or timed out call against the circuit breaker of {provider}, opening it
+    after CIRCUIT_BREAKER_THRESHOLD consecutive failures or a failed probe.
+    """
+    if provider not in CIRCUIT_BREAKER_PROVIDERS:
+        return
+    with _circuit_breakers_lock:
+        _circuit_probes.discard(provider)
+        breaker = _load_circuit_breakers().get(provider, {"state": "closed", "failures": 0, "opened_at": 0})
+        failures = breaker["failures"] + 1
+        if breaker["state"] == "half_open" or failures >= CIRCUIT_BREAKER_THRESHOLD:
+            _set_circuit_breaker(provider, {"state": "open", "failures": failures, "opened_at": time.time()}, f"{failures} consecutive failures, last: {reason}")
+        else:
+            _set_circuit_breaker(provider, dict(breaker, failures=failures), reason)
+
+LLM_PROXY_URL = os.getenv("LLM_PROXY_URL", "https://llm-proxy.metaculus.com/proxy/anthropic/v1/messages/")
+LLM_MODEL = "claude-3-5-sonnet-20241022"
+LLM_CACHE_DIR = os.path.join(CACHE_DIR, "llm")
+
+llm_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+llm_usage_stats = {
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "cache_read_input_tokens": 0,
+}
+llm_stream_stats = []  # one {time_to_first_token, time_to_answer, tokens_per_second} per streamed call
+llm_hedge_stats = {"hedges": 0, "hedge_wins": 0}
+_llm_latencies = {}  # (provider, call type) -> recent wire times in seconds of answered LLM calls
+_llm_cache_lock = threading.Lock()
+# Running size of the cache directory (None until the first scan) and writes since the last scan
+_llm_cache_index = {"bytes": None, "writes": 0}
+_llm_cache_index_lock = threading.Lock()
+_llm_cache_evict_lock = threading.Lock()
+
+def llm_cache_key(url: str, payload: dict, cache_salt: str | None = None) -> str:
+    """
+    Content address of an LLM call: hash of endpoint, model, temperature and messages.
+    {cache_salt} separates calls that are meant to be sampled independently (e.g. ensemble runs).
+    """
+    key_data = {
+        "endpoint": url,
+        "model": payload.get("model"),
+        "temperature": payload.get("temperature"),
+        "messages": payload.get("messages"),
+        "salt": cache_salt,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+def read_llm_cache(key: str) -> dict | None:
+    path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry["created_at"] > LLM_CACHE_TTL:
+        return None
+    os.utime(path)  # mark as recently used for LRU eviction
+    return entry["response"]
+
+def write_llm_cache(key: str, response_data: dict) -> None:
+    """
+    Store a response. The cache directory is only scanned by evict_llm_cache when the running
+    size goes over LLM_CACHE_MAX_BYTES, or every LLM_CACHE_SCAN_EVERY writes for expired entries.
+    """
+    path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    data = json.dumps({"created_at": time.time(), "response": response_data})
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        try:
+            replaced_size = os.path.getsize(path)
+        except OSError:
+            replaced_size = 0
+        # Written aside and renamed, so a concurrent reader never sees half an entry
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write LLM cache entry: {e}")
+        return
+    with _llm_cache_index_lock:
+        _llm_cache_index["writes"] += 1
+        if _llm_cache_index["bytes"] is not None:
+            # json.dumps escapes non-ASCII, so characters are bytes
+            _llm_cache_index["bytes"] += len(data) - replaced_size
+        scan = (
+            _llm_cache_index["bytes"] is None
+            or _llm_cache_index["bytes"] > LLM_CACHE_MAX_BYTES
+            or _llm_cache_index["writes"] >= LLM_CACHE_SCAN_EVERY
+        )
+    if scan:
+        try:
+            evict_llm_cache()
+        except OSError as e:
+            print(f"Could not evict LLM cache entries: {e}")
+
+def evict_llm_cache() -> None:
+    """
+    Remove expired entries, then the least recently used ones until the cache fits LLM_CACHE_MAX_BYTES,
+    and reset the running size. A scan already in progress in another thread is not repeated.
+    """
+    if not _llm_cache_evict_lock.acquire(blocking=False):
+        return
+    try:
+        entries = []
+        for name in os.listdir(LLM_CACHE_DIR):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(LLM_CACHE_DIR, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        now = time.time()
+        evictions = 0
+        for mtime, size, path in entries:
+            if total_size <= LLM_CACHE_MAX_BYTES and now - mtime <= LLM_CACHE_TTL:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                total_size -= size
+                evictions += 1
+        with _llm_cache_index_lock:
+            _llm_cache_index["bytes"] = total_size
+            _llm_cache_index["writes"] = 0
+        with _llm_cache_lock:
+            llm_cache_stats["evictions"] += evictions
+    finally:
+        _llm_cache_evict_lock.release()
+
+def cached_llm_post(
+    provider: str,
+    url: str,
+    headers: dict,
+    payload: dict,
+    cache_salt: str | None = None,
+    answer_extractor=None,
+    on_answer=None,
+    hedge: str | None = None,
+    on_start=None,
+) -> dict:
+    """
+    POST an LLM request and return the decoded JSON response, replaying it from the
+    on-disk cache when the same call was answered before. Raises for HTTP errors.
+    Requests with "stream" set are read as Anthropic server-sent events, see stream_llm_response.
+    {hedge} names the call type of a call that is safe to hedge; with LLM_HEDGING it gets a
+    duplicate once it is slow for its call type, see hedged_llm_fetch. on_start() is called once a
+    streamed answer has begun.
+    """
+    key = llm_cache_key(url, payload, cache_salt)
+    if not LLM_CACHE_BYPASS:
+        cached = read_llm_cache(key)
+        with _llm_cache_lock:
+            llm_cache_stats["hits" if cached is not None else "misses"] += 1
+        if cached is not None:
+            return cached
+
+    hedged = bool(hedge) and LLM_HEDGING
+    if hedged and on_answer:
+        # Both copies of a hedged call stream the answer, only the first one is reported
+        answered = threading.Event()
+        report_answer = on_answer
+        def on_answer(answer, text):
+            if not answered.is_set():
+                answered.set()
+                report_answer(answer, text)
+
+    def fetch():
+        with span(f"llm.{provider}", cache_salt=cache_salt) as record:
+            if payload.get("stream"):
+                response_data = stream_llm_response(provider, url, headers, payload, answer_extractor, on_answer, on_start)
+            else:
+                response = http_request(provider, "POST", url, headers=headers, json=payload)
+                response.raise_for_status()
+                response_data = response.json()
+            if hedge:
+                # Only the time on the wire, bucket, slot and retry waits say nothing about a slow answer
+                record_llm_latency(provider, hedge, _provider_call_state.wire_seconds)
+            # Usage is recorded per copy, the losing copy of a hedged call is paid for too
+            if provider == "llm_proxy":
+                record_llm_usage(response_data)
+                usage = response_data.get("usage") or {}
+                record["input_tokens"] = (
+                    usage.get("input_tokens", 0)
+                    + usage.get("cache_creation_input_tokens", 0)
+                    + usage.get("cache_read_input_tokens", 0)
+                )
+                record["output_tokens"] = usage.get("output_tokens", 0)
+            return response_data
+
+    if hedged:
+        response_data = circuit_call(provider, hedged_llm_fetch, provider, hedge, fetch)
+    else:
+        response_data = circuit_call(provider, fetch)
+    if not LLM_CACHE_BYPASS:
+        write_llm_cache(key, response_data)
+    return response_data
+
+def record_llm_latency(provider: str, call_type: str, seconds: float) -> None:
+    with _llm_cache_lock:
+        _llm_latencies.setdefault((provider, call_type), collections.deque(maxlen=200)).append(seconds)
+
+def hedge_delay(provider: str, call_type: str) -> float | None:
+    """
+    LLM_HEDGE_PERCENTILE of the recent {provider} latencies of {call_type}, or None while there
+    are too few samples. Call types are kept apart because a prior and a forecaster rationale
+    take very different times to generate.
+    """
+    import numpy as np
+    with _llm_cache_lock:
+        latencies = list(_llm_latencies.get((provider, call_type), ()))
+    if len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return float(np.percentile(latencies, LLM_HEDGE_PERCENTILE))
+
+def hedged_llm_fetch(provider: str, call_type: str, fetch) -> dict:
+    """
+    Run the idempotent LLM call {fetch}; if it has not answered hedge_delay after it got its
+    provider slot, fire a duplicate (while LLM_HEDGE_BUDGET lasts) and return whichever copy
+    succeeds first. Raises only if every copy failed.
+    """
+    results = queue.Queue()
+    on_wire = threading.Event()
+
+    def attempt(is_hedge):
+        if not is_hedge:
+            _provider_call_state.on_slot = on_wire.set
+        try:
+            results.put((is_hedge, fetch(), None))
+        except Exception as e:
+            results.put((is_hedge, None, e))
+        finally:
+            _provider_call_state.on_slot = None
+            on_wire.set()
+
+    threading.Thread(target=attempt, args=(False,), daemon=True).start()
+    in_flight = 1
+    # hedge_delay is a time on the wire, waiting for the bucket or a slot is no reason to hedge;
+    # a duplicate would only queue behind the same slots
+    on_wire.wait()
+    try:
+        outcome = results.get(timeout=hedge_delay(provider, call_type))
+    except queue.Empty:
+        with _llm_cache_lock:
+            can_hedge = llm_hedge_stats["hedges"] < LLM_HEDGE_BUDGET
+            if can_hedge:
+                llm_hedge_stats["hedges"] += 1
+        if can_hedge:
+            threading.Thread(target=attempt, args=(True,), daemon=True).start()
+            in_flight += 1
+        outcome = results.get()
+    in_flight -= 1
+    # A failed copy only counts once the other one failed as well
+    while outcome[2] is not None and in_flight:
+        outcome = results.get()
+        in_flight -= 1
+
+    is_hedge, response_data, error = outcome
+    if error is not None:
+        raise error
+    if is_hedge:
+        with _llm_cache_lock:
+            llm_hedge_stats["hedge_wins"] += 1
+    return response_data
+
+def stream_llm_response(
+    provider: str, url: str, headers: dict, payload: dict, answer_extractor=None, on_answer=None, on_start=None
+) -> dict:
+    """
+    Consume a streamed Anthropic messages response and return it in the non-streaming
+    response shape, so callers and the cache do not need to care how it was fetched.
+
+    The answer is complete as soon as its content block ends, before the final usage event
+    and the end of the connection; answer_extractor(text) is then run on it and, if it finds
+    the answer, on_answer(answer, text) is called. The stream is read inside the provider
+    slot, so a generation counts against PROVIDER_CONCURRENCY until it has been fully read.
+    Time to first token, time to answer and tokens per second of every call are appended to
+    llm_stream_stats.
+    """
+    def read_stream():
+        start = time.monotonic()
+        first_token_at = None
+        answer_at = None
+        text = ""
+        usage = {}
+        raw_lines = []
+        response = get_http_session(url).request("POST", url, headers=headers, json=payload, stream=True, timeout=HTTP_TIMEOUT)
+        if response.status_code != 200:
+            # Handed back to provider_call, which retries or returns it to be raised below
+            return response
+        response.encoding = "utf-8"  # event streams carry no charset and requests would guess latin-1
+        with response:
+            # chunk_size=None hands over events as they arrive instead of waiting for 512 byte chunks
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if CASSETTE_DIR:
+                    raw_lines.append(line)
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):])
+                if event["type"] == "message_start":
+                    # The prompt has been processed, so its cache entry can be read from now on
+                    if on_start:
+                        on_start()
+                    usage.update(event["message"].get("usage") or {})
+                elif event["type"] == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                    text += event["delta"]["text"]
+                elif event["type"] == "content_block_stop" and answer_extractor and answer_at is None:
+                    try:
+                        answer = answer_extractor(text)
+                    except ValueError:
+                        continue
+                    answer_at = time.monotonic()
+                    if on_answer:
+                        on_answer(answer, text)
+                elif event["type"] == "message_delta":
+                    usage.update(event.get("usage") or {})
+                elif event["type"] == "error":
+                    raise requests.exceptions.RequestException(f"Streaming error: {event.get('error')}")
+        end = time.monotonic()
+        if CASSETTE_DIR:
+            record_cassette(provider, "POST", url, {"json": payload}, response, "\n".join(raw_lines) + "\n")
+        stats = {
+            "time_to_first_token": first_token_at - start if first_token_at else None,
+            "time_to_answer": answer_at - start if answer_at else None,
+            "tokens_per_second": usage.get("output_tokens", 0) / (end - first_token_at) if first_token_at and end > first_token_at else None,
+        }
+        return {"content": [{"type": "text", "text": text}], "usage": usage}, stats, len(text.encode())
+
+    parts = urlsplit(url)
+    with span(f"http.{provider}", method="POST", url=f"{parts.netloc}{parts.path}") as record:
+        result = provider_call(provider, read_stream)
+        if isinstance(result, requests.Response):
+            record["status"] = result.status_code
+            record["bytes"] = len(result.content)
+            result.raise_for_status()
+            raise requests.exceptions.HTTPError(f"Unexpected status {result.status_code}", response=result)
+        response_data, stats, record["bytes"] = result
+        record["status"] = 200
+    with _llm_cache_lock:
+        llm_stream_stats.append(stats)
+    print(f"LLM stream: {stats}")
+    return response_data
+
+def call_llm_proxy(
+    content: str,
+    temperature: float | None = 0.1,
+    cache_salt: str | None = None,
+    cache_prefix: str | None = None,
+    answer_extractor=None,
+    on_answer=None,
+    hedge: str | None = None,
+    on_start=None,
+) -> str:
+    """
+    Send a single user message to Claude through the Metaculus LLM proxy and return the answer text.
+    {cache_prefix} is put in front of {content}; with PROMPT_CACHING it is sent as a separate
+    block marked for Anthropic prompt caching, so calls sharing the prefix only pay for it once.
+    With LLM_STREAMING the answer is streamed and on_answer(answer, text) is called as soon
+    as the answer text is complete and answer_extractor finds the answer in it. {hedge} names the call type of a call that is safe to hedge,
+    on_start() is called once a streamed answer has begun.
+    """
+    headers = {
+        "Authorization": f"Token {METACULUS_TOKEN}",
+        "anthropic-version": "2023-06-01",
+        "Content-Type": "application/json"
+    }
+    if cache_prefix is not None and PROMPT_CACHING:
+        headers["anthropic-beta"] = "prompt-caching-2024-07-31"
+        message_content = [{"type": "text", "text": cache_prefix, "cache_control": {"type": "ephemeral"}}]
+        if content:
+            message_content.append({"type": "text", "text": content})
+    elif cache_prefix is not None:
+        message_content = cache_prefix + content
+    else:
+        message_content = content
+    json_code = {
+        "model": LLM_MODEL,
+        "max_tokens": 4096,
+        "messages": [
+            {
+                "role": "user",
+                "content": message_content
+            }
+        ]
+    }
+    if temperature is not None:
+        json_code["temperature"] = temperature
+    if LLM_STREAMING:
+        json_code["stream"] = True
+    response_data = cached_llm_post(
+        "llm_proxy", LLM_PROXY_URL, headers, json_code, cache_salt, answer_extractor, on_answer, hedge, on_start
+    )
+    return response_data['content'][0]['text']
+
+class PromptCacheWarmup:
+    """
+    Orders calls that share a cached prompt prefix: the first call goes out alone and the others
+    wait until its answer has begun, because Anthropic can only serve a cache entry once it has been
+    written. Sent at the same time, every call would pay the cache write instead of one.
+    run(call) calls call(on_start); the first call has to call on_start() as soon as its answer
+    has begun (with LLM_STREAMING at message_start), otherwise the others wait until it returns.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.claimed = False
+        self.warm = threading.Event()
+
+    def run(self, call):
+        if not PROMPT_CACHING:
+            return call(None)
+        with self.lock:
+            leader = not self.claimed
+            self.claimed = True
+        if not leader:
+            self.warm.wait()
+            return call(None)
+        try:
+            return call(self.warm.set)
+        finally:
+            # Also released when the first call failed, the others then write the cache themselves
+            self.warm.set()
+
+def record_llm_usage(response_data: dict) -> None:
+    """
+    Add the token counts of a fresh LLM proxy response to llm_usage_stats.
+    """
+    usage = response_data.get("usage") or {}
+    with _llm_cache_lock:
+        for key in llm_usage_stats:
+            llm_usage_stats[key] += usage.get(key) or 0
 
 def post_question_comment(post_id: int, comment_text: str) -> None:
     """
     Post a comment on the question page as the bot user.
     """
 
-    response = requests.post(
+    response = http_request(
+        "metaculus",
+        "POST",
         f"{API_BASE_URL}/comments/create/",
         json={
             "text": comment_text,
@@ -660,20 +1576,175 @@ def post_question_prediction(question_id: int, forecast_payload: dict) -> None:
     """
     Post a forecast on a question.
     """
+    error = post_question_predictions([(question_id, forecast_payload)])[question_id]
+    if error:
+        raise Exception(error)
+
+def post_question_predictions(forecasts: list[tuple[int, dict]]) -> dict[int, str | None]:
+    """
+    Post forecasts on several questions in one request.
+    Returns {question_id: error text, or None if the forecast was accepted}. If the bulk
+    request is rejected, the forecasts are posted one by one so that a single bad item
+    does not take the rest of the batch down with it.
+    """
     url = f"{API_BASE_URL}/questions/forecast/"
-    response = requests.post(
+    response = http_request(
+        "metaculus",
+        "POST",
         url,
         json=[
             {
                 "question": question_id,
                 **forecast_payload,
-            },
+            }
+            for question_id, forecast_payload in forecasts
         ],
         **AUTH_HEADERS,
     )
     print(response)
-    if not response.ok:
-        raise Exception(response.text)
+    if response.ok:
+        return {question_id: None for question_id, _ in forecasts}
+    if len(forecasts) == 1:
+        return {forecasts[0][0]: response.text}
+
+    results = {}
+    for forecast in forecasts:
+        results.update(post_question_predictions([forecast]))
+    return results
+
+FORECAST_LEDGER_PATH = os.path.join(CACHE_DIR, "forecast_ledger.json")
+_forecast_ledger_lock = threading.Lock()
+
+def load_forecast_ledger() -> dict:
+    """
+    Return the local ledger of forecast questions:
+    {"verified_at": time of the last full check against the API, "questions": {question_id: {...}}}
+    """
+    with _forecast_ledger_lock:
+        try:
+            with open(FORECAST_LEDGER_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"verified_at": 0, "questions": {}}
+
+def _update_forecast_ledger(update) -> None:
+    with _forecast_ledger_lock:
+        try:
+            with open(FORECAST_LEDGER_PATH) as f:
+                ledger = json.load(f)
+        except (OSError, ValueError):
+            ledger = {"verified_at": 0, "questions": {}}
+        update(ledger)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(f"{FORECAST_LEDGER_PATH}.tmp", "w") as f:
+                json.dump(ledger, f)
+            os.replace(f"{FORECAST_LEDGER_PATH}.tmp", FORECAST_LEDGER_PATH)
+        except OSError as e:
+            print(f"Could not write forecast ledger: {e}")
+
+def record_forecast(question_id: int, post_id: int) -> None:
+    """
+    Remember that the bot has a forecast on a question.
+    """
+    def update(ledger):
+        ledger["questions"][str(question_id)] = {"post_id": post_id, "recorded_at": time.time()}
+    _update_forecast_ledger(update)
+
+def mark_forecast_ledger_verified() -> None:
+    """
+    Record that every open question has just been checked against the API.
+    """
+    def update(ledger):
+        ledger["verified_at"] = time.time()
+    _update_forecast_ledger(update)
+
+_pending_forecasts = []  # [(question_id, post_id, forecast_payload, comment)]
+_pending_forecasts_since = 0.0  # monotonic time the oldest queued forecast was queued
+_pending_forecasts_lock = threading.Lock()
+_comment_queue = queue.Queue()
+_comment_worker = None
+_comment_worker_lock = threading.Lock()
+_submission_errors = []
+
+def queue_forecast_submission(question_id: int, post_id: int, forecast_payload: dict, comment: str) -> None:
+    """
+    Queue a finished forecast; the queue is posted in bulk once it holds SUBMISSION_BATCH_SIZE forecasts
+    or its oldest forecast has waited SUBMISSION_MAX_DELAY seconds.
+    """
+    global _pending_forecasts_since
+    with _pending_forecasts_lock:
+        if not _pending_forecasts:
+            _pending_forecasts_since = time.monotonic()
+        _pending_forecasts.append((question_id, post_id, forecast_payload, comment))
+        if len(_pending_forecasts) < SUBMISSION_BATCH_SIZE:
+            return
+    post_queued_forecasts()
+
+def post_queued_forecasts(only_overdue: bool = False) -> None:
+    """
+    Post the queued forecasts now, or with {only_overdue} only if the oldest one has waited
+    SUBMISSION_MAX_DELAY seconds. Failures are collected for flush_submissions.
+    """
+    with _pending_forecasts_lock:
+        if only_overdue and time.monotonic() - _pending_forecasts_since < SUBMISSION_MAX_DELAY:
+            return
+        batch = list(_pending_forecasts)
+        _pending_forecasts.clear()
+    submit_forecast_batch(batch)
+
+def submit_forecast_batch(batch: list) -> None:
+    """
+    Post a batch of queued forecasts and queue the comment of every accepted one.
+    """
+    if not batch:
+        return
+    try:
+        results = post_question_predictions([(question_id, forecast_payload) for question_id, _, forecast_payload, _ in batch])
+    except Exception as e:
+        results = {question_id: str(e) for question_id, _, _, _ in batch}
+    for question_id, post_id, _, comment in batch:
+        error = results[question_id]
+        if error:
+            print(f"Submitting forecast for question {question_id} failed: {error}")
+            _submission_errors.append(Exception(error))
+            continue
+        save_checkpoint_stage(question_id, "submission.forecast", True)
+        record_forecast(question_id, post_id)
+        queue_question_comment(question_id, post_id, comment)
+
+def queue_question_comment(question_id: int, post_id: int, comment_text: str) -> None:
+    """
+    Queue a comment to be posted by the background comment worker.
+    """
+    global _comment_worker
+    with _comment_worker_lock:
+        if _comment_worker is None:
+            _comment_worker = threading.Thread(target=_post_queued_comments, daemon=True)
+            _comment_worker.start()
+    _comment_queue.put((question_id, post_id, comment_text))
+
+def _post_queued_comments() -> None:
+    while True:
+        question_id, post_id, comment_text = _comment_queue.get()
+        try:
+            post_question_comment(post_id, comment_text)
+            clear_checkpoint(question_id)
+        except Exception as e:
+            print(f"Posting comment for question {question_id} failed: {e}")
+            _submission_errors.append(e)
+        finally:
+            _comment_queue.task_done()
+
+def flush_submissions() -> list[Exception]:
+    """
+    Post all queued forecasts, wait for the queued comments and return the submission errors.
+    """
+    post_queued_forecasts()
+    _comment_queue.join()
+    errors = list(_submission_errors)
+    _submission_errors.clear()
+    return errors
 
 def create_forecast_payload(
     forecast: float | dict[str, float] | list[float],
@@ -713,7 +1784,9 @@ def get_question_details(question_id: int) -> dict:
     """
     url = f"{API_BASE_URL}/questions/{question_id}/"
     print(url)
-    response = requests.get(
+    response = http_request(
+        "metaculus",
+        "GET",
         url,
         **AUTH_HEADERS,
     )
@@ -740,38 +1813,124 @@ def list_posts(tournament_id, offset=0, count=50) -> list[dict]:
         "include_description": "true",
     }
     url = f"{API_BASE_URL}/posts/"
-    response = requests.get(url, **AUTH_HEADERS, params=url_qparams)
+    response = http_request("metaculus", "GET", url, **AUTH_HEADERS, params=url_qparams)
     if not response.ok:
         raise Exception(response.text)
     data = json.loads(response.content)
     return data
 
+_asknews_client = None
+_asknews_results = {}  # normalized query -> (started_at, future of (full context, formatted articles))
+_asknews_lock = threading.Lock()
+
+def get_asknews_client():
+    """
+    Return the AskNews client shared by the whole run, so its OAuth token is fetched once.
+    """
+    global _asknews_client
+    with _asknews_lock:
+        if _asknews_client is None:
+            from asknews_sdk import AskNewsSDK
+
+            # Extra keyword arguments are passed on to the SDK's httpx client
+            client_options = {"event_hooks": {"response": [record_asknews_response]}} if CASSETTE_DIR else {}
+            _asknews_client = AskNewsSDK(
+                client_id=ASKNEWS_CLIENT_ID,
+                client_secret=ASKNEWS_SECRET,
+                scopes=["news"],
+                base_url=ASKNEWS_API_URL,
+                token_url=ASKNEWS_TOKEN_URL,
+                **client_options,
+            )
+        return _asknews_client
+
+def record_asknews_response(response) -> None:
+    """
+    httpx response hook of the AskNews client that records its API calls to the cassette.
+    The OAuth token exchange is left out, replay_server.py answers it with a dummy token.
+    """
+    if str(response.request.url) == ASKNEWS_TOKEN_URL:
+        return
+    response.read()
+    body = json.loads(response.request.content) if response.request.content else None
+    record_cassette("asknews", response.request.method, str(response.request.url), {"json": body}, response)
+
+def normalize_news_query(query: str) -> str:
+    """
+    Cache key of a news query: lower case, without dates and punctuation, so questions of a
+    series that only differ by their date share one retrieval.
+    """
+    months = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?"
+    query = query.lower()
+    query = re.sub(r"\b\d{4}-\d{1,2}-\d{1,2}\b", " ", query)
+    # The day needs a word boundary, otherwise "March 2025" reads as March 20 followed by "25"
+    query = re.sub(rf"\b{months}\s+\d{{1,2}}(?:st|nd|rd|th)?\b,?(?:\s+\d{{4}}\b)?", " ", query)
+    query = re.sub(rf"\b\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{months}(?:,?\s+\d{{4}}\b)?", " ", query)
+    query = re.sub(rf"\b{months}\s+\d{{4}}\b", " ", query)
+    query = re.sub(r"[^\w\s]", " ", query)
+    return " ".join(query.split())
+
 def get_asknews_context(query: str) -> tuple[str, str]:
     """
     Use the AskNews `news` endpoint to get news context for your query.
     The full API reference can be found here: https://docs.asknews.app/en/reference#get-/v1/news/search
+
+    Retrievals are shared for ASKNEWS_CACHE_TTL seconds between queries with the same
+    normalize_news_query key; a query already in flight is waited for instead of repeated.
+    A failed retrieval is not cached.
     """
-    ask = AskNewsSDK(
-        client_id=ASKNEWS_CLIENT_ID,
-        client_secret=ASKNEWS_SECRET,
-        scopes=["news"]
-    )
+    def reusable(entry):
+        started_at, future = entry
+        return time.time() - started_at < ASKNEWS_CACHE_TTL and not (future.done() and future.exception() is not None)
+
+    key = normalize_news_query(query)
+    with _asknews_lock:
+        entry = _asknews_results.get(key)
+        reuse = entry is not None and reusable(entry)
+        if reuse:
+            future = entry[1]
+        else:
+            # Expired and failed retrievals are dropped here, so a long running daemon does not pile them up
+            for stale_key in [stale_key for stale_key, stale in _asknews_results.items() if not reusable(stale)]:
+                del _asknews_results[stale_key]
+            future = Future()
+            _asknews_results[key] = (time.time(), future)
+    if reuse:
+        print(f"Reusing AskNews results for '{key}'")
+        return future.result()
 
-    # get the latest news related to the query (within the past 48 hours)
-    hot_response = ask.news.search_news(
-        query=query, # your natural language query
-        n_articles=10, # control the number of articles to include in the context, originally 5
-        return_type="both",
-        strategy="latest news" # enforces looking at the latest news only
-    )
+    try:
+        future.set_result(fetch_asknews_context(query))
+    except Exception as e:
+        future.set_exception(e)
+    return future.result()
 
-    # get context from the "historical" database that contains a news archive going back to 2023
-    historical_response = ask.news.search_news(
-        query=query,
-        n_articles=10,
-        return_type="both",
-        strategy="news knowledge" # looks for relevant news within the past 60 days
-    )
+def fetch_asknews_context(query: str) -> tuple[str, str]:
+    """
+    Run the "latest news" and "news knowledge" searches for {query} concurrently.
+    """
+    ask = get_asknews_client()
+
+    # An open AskNews circuit breaker raises CircuitOpenError, which sends the news stage to its fallback
+    def search(strategy):
+        return circuit_call(
+            "asknews",
+            provider_call,
+            "asknews",
+            ask.news.search_news,
+            query=query, # your natural language query
+            n_articles=10, # control the number of articles to include in the context, originally 5
+            return_type="both",
+            strategy=strategy,
+        )
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # get the latest news related to the query (within the past 48 hours)
+        hot_future = executor.submit(search, "latest news") # enforces looking at the latest news only
+        # get context from the "historical" database that contains a news archive going back to 2023
+        historical_future = executor.submit(search, "news knowledge") # looks for relevant news within the past 60 days
+        hot_response = hot_future.result()
+        historical_response = historical_future.result()
 
     # you can also specify a time range for your historical search if you want to
     # slice your search up periodically.
@@ -792,35 +1951,101 @@ def get_asknews_context(query: str) -> tuple[str, str]:
     return news_articles_with_full_context, formatted_articles
 
 
-def format_asknews_context(hot_articles: list[dict], historical_articles: list[dict]) -> str:
+def canonical_article_url(url: str) -> str:
     """
-    Format the articles for posting to Metaculus.
+    URL without scheme, "www.", fragment, tracking parameters and trailing slash, so the same article
+    linked from different feeds compares equal.
     """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = "&".join(
+        sorted(
+            param for param in parts.query.split("&")
+            if param and not param.lower().startswith(("utm_", "fbclid", "gclid", "ref="))
+        )
+    )
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else "")
 
-    formatted_articles = "Here are the relevant news articles:\n\n"
-
-    if hot_articles:
-      hot_articles = [article.__dict__ for article in hot_articles]
-      hot_articles = sorted(
-          hot_articles, key=lambda x: x['pub_date'], reverse=True)
-
-      for article in hot_articles:
-          pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
-          formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+def article_minhash(text: str, num_hashes: int = 64):
+    """
+    MinHash signature of the word 3-shingles of {text}; the share of equal entries of two
+    signatures estimates the Jaccard similarity of their shingle sets.
+    """
+    import numpy as np
+
+    words = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+    prime = (1 << 31) - 1
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big") % prime for shingle in shingles],
+        dtype=np.uint64,
+    )
+    # Fixed seed, signatures must be comparable between calls
+    rng = np.random.default_rng(0)
+    a = rng.integers(1, prime, num_hashes, dtype=np.uint64)
+    b = rng.integers(0, prime, num_hashes, dtype=np.uint64)
+    return ((a[:, None] * hashes[None, :] + b[:, None]) % prime).min(axis=1)
+
+def format_asknews_context(
+    hot_articles: list[dict],
+    historical_articles: list[dict],
+    token_budget: int = NEWS_CONTEXT_TOKEN_BUDGET,
+) -> str:
+    """
+    Format the articles for the news summarizer.
 
-    if historical_articles:
-      historical_articles = [article.__dict__ for article in historical_articles]
-      historical_articles = sorted(
-          historical_articles, key=lambda x: x['pub_date'], reverse=True)
+    Articles are ranked by relevance (their position in the AskNews results) plus recency
+    (halving every NEWS_RECENCY_HALF_LIFE days). In rank order, an article is dropped if its
+    canonical URL was already taken or its text is a near duplicate (NEWS_DUPLICATE_SIMILARITY)
+    of a taken one, and skipped if it does not fit into the remaining {token_budget}
+    (estimated at 4 characters per token). The kept articles are listed newest first.
+    """
+    import numpy as np
 
-      for article in historical_articles:
-          pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
-          formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+    formatted_articles = "Here are the relevant news articles:\n\n"
 
     if not hot_articles and not historical_articles:
       formatted_articles += "No articles were found.\n\n"
       return formatted_articles
 
+    candidates = []
+    for results in (hot_articles or [], historical_articles or []):
+      for position, article in enumerate(results):
+        article = article.__dict__
+        # AskNews returns pydantic AnyUrl objects for article_url
+        article_url = str(article["article_url"])
+        pub_date = article["pub_date"]
+        age_days = max(0.0, (datetime.datetime.now(pub_date.tzinfo) - pub_date).total_seconds() / 86400)
+        relevance = 1 - position / len(results)
+        recency = 0.5 ** (age_days / NEWS_RECENCY_HALF_LIFE)
+        text = f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date.strftime('%B %d, %Y %I:%M %p')}\nSource:[{article['source_id']}]({article_url})\n\n"
+        candidates.append((relevance + recency, article, article_url, pub_date, text))
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    kept = []
+    seen_urls = set()
+    signatures = []
+    duplicates = over_budget = 0
+    tokens_left = token_budget
+    for _, article, article_url, pub_date, text in candidates:
+      url = canonical_article_url(article_url)
+      signature = article_minhash(f"{article['eng_title']} {article['summary']}")
+      if url in seen_urls or any(np.mean(signature == other) >= NEWS_DUPLICATE_SIMILARITY for other in signatures):
+        duplicates += 1
+        continue
+      tokens = len(text) // 4
+      if tokens > tokens_left:
+        over_budget += 1
+        continue
+      seen_urls.add(url)
+      signatures.append(signature)
+      tokens_left -= tokens
+      kept.append((pub_date, text))
+
+    print(f"News context: {len(kept)} articles, {duplicates} duplicates dropped, {over_budget} over the token budget, ~{token_budget - tokens_left} tokens")
+    for _, text in sorted(kept, key=lambda item: item[0], reverse=True):
+      formatted_articles += text
+
     # formatted_articles += f"*Generated by AI at [AskNews](https://asknews.app), check out the [API](https://docs.asknews.app) for more information*."
 
     return formatted_articles
@@ -849,7 +2074,153 @@ def extract_meta_id(forecast_text: str) -> float:
       )
 
 
-def get_gpt_prediction(question_details: dict,question_id, num_runs: int = 1) -> tuple[float, str]:
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, "checkpoints")
+_checkpoint_lock = threading.Lock()
+
+def load_checkpoint(question_id: int) -> dict:
+    """
+    Return {stage: result} of the pipeline stages already completed for a question,
+    or an empty dict if there is no checkpoint younger than CHECKPOINT_TTL.
+    """
+    path = os.path.join(CHECKPOINT_DIR, f"{question_id}.json")
+    with _checkpoint_lock:
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return {}
+    if time.time() - checkpoint.get("created_at", 0) > CHECKPOINT_TTL:
+        return {}
+    return checkpoint["stages"]
+
+def save_checkpoint_stage(question_id: int, stage: str, result) -> None:
+    """
+    Persist the result of a completed pipeline stage of a question.
+    """
+    path = os.path.join(CHECKPOINT_DIR, f"{question_id}.json")
+    with _checkpoint_lock:
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+            if time.time() - checkpoint.get("created_at", 0) > CHECKPOINT_TTL:
+                raise ValueError("stale checkpoint")
+        except (OSError, ValueError):
+            checkpoint = {"created_at": time.time(), "stages": {}}
+        checkpoint["stages"][stage] = result
+        try:
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            # Write to a temporary file first so a crash never leaves a truncated checkpoint
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(checkpoint, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"Could not write checkpoint for question {question_id}: {e}")
+
+def clear_checkpoint(question_id: int) -> None:
+    """
+    Drop the checkpoint of a question whose forecast and comment have both been submitted,
+    so the next run forecasts it afresh instead of resuming a finished question.
+    """
+    path = os.path.join(CHECKPOINT_DIR, f"{question_id}.json")
+    with _checkpoint_lock:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not remove checkpoint for question {question_id}: {e}")
+
+def call_with_retries(fn, *args, max_retries: int = 3, retry_delay: float = 5, **kwargs):
+    """
+    Call fn(*args, **kwargs), retrying request failures up to max_retries times with jittered
+    exponential backoff from retry_delay. Throttling and transient HTTP errors are already
+    retried per request by provider_call, this covers whole stages (e.g. a broken stream).
+    """
+    for attempt in range(max_retries):
+        try:
+            return fn(*args, **kwargs)
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed (Attempt {attempt + 1}/{max_retries}): {e}")
+            if attempt < max_retries - 1:
+                delay = backoff_delay(attempt + 1, retry_delay)
+                print(f"Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+            else:
+                raise
+
+def run_stage_graph(
+    stages: dict,
+    timeouts: dict,
+    completed: dict | None = None,
+    on_complete=None,
+    on_timeout=None,
+    span_prefix: str = "stage",
+    span_attributes: dict | None = None,
+) -> dict:
+    """
+    Run a dependency graph of stages and return {stage name: result}.
+
+    stages maps a name to (dependencies, function, fallback). A stage starts as soon as
+    all of its dependencies have finished and receives their results as positional
+    arguments, so independent branches run concurrently. If a stage raises or runs
+    longer than timeouts[name] seconds, its fallback becomes its result.
+    Stages found in {completed} are not run again; on_complete(name, result) is called
+    for every stage that finishes successfully, on_timeout(name) for every stage that runs out
+    of time. Every stage runs in a span named
+    "{span_prefix}.{name}" that carries {span_attributes} and its dependencies.
+    """
+    results = dict(completed or {})
+    pending = {name: stage for name, stage in stages.items() if name not in results}
+    running = {}  # future -> (name, deadline)
+    executor = ThreadPoolExecutor(max_workers=max(1, len(stages)))
+    try:
+        while pending or running:
+            ready = [name for name, (deps, _, _) in pending.items() if all(dep in results for dep in deps)]
+            for name in ready:
+                deps, function, _ = pending.pop(name)
+                key = f"{span_prefix}.{name}"
+                function = traced(
+                    function, key, key=key, deps=[f"{span_prefix}.{dep}" for dep in deps], **(span_attributes or {})
+                )
+                future = executor.submit(function, *[results[dep] for dep in deps])
+                running[future] = (name, time.monotonic() + timeouts.get(name, 300))
+            if not running:
+                raise ValueError(f"Stages with unresolvable dependencies: {list(pending)}")
+
+            next_deadline = min(deadline for _, deadline in running.values())
+            done, _ = wait(running, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    if on_complete:
+                        on_complete(name, results[name])
+                except Exception as e:
+                    print(f"Stage {name} failed, using fallback: {e}")
+                    results[name] = stages[name][2]
+
+            now = time.monotonic()
+            for future, (name, deadline) in list(running.items()):
+                if deadline <= now:
+                    print(f"Stage {name} timed out, using fallback")
+                    results[name] = stages[name][2]
+                    del running[future]
+                    if on_timeout:
+                        on_timeout(name)
+    finally:
+        # Timed out stages keep running in the background, but nobody waits for them
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def get_gpt_prediction(question_details: dict,question_id, num_runs: int = 1, predictions_full: list | None = None) -> tuple[float, str]:
+
+    # Resume from the stages an earlier, interrupted run already finished
+    checkpoint = load_checkpoint(question_id)
+    if "aggregation" in checkpoint:
+      print(f"Using checkpointed forecast for question {question_id}")
+      forecast, comment = checkpoint["aggregation"]
+      return forecast, comment
 
     today = datetime.datetime.now().strftime("%Y-%m-%d")
     title = question_details["title"]
@@ -881,7 +2252,13 @@ def get_gpt_prediction(question_details: dict,question_id, num_runs: int = 1) ->
     else:
       lower_bound_message = f"The outcome can not be lower than {lower_bound}."
 
-    if GET_NEWS == True:
+    ## Research stage
+
+    # The research branches do not depend on each other, so they run as a stage graph:
+    # news search -> news summary, prior prompt -> Perplexity (twice) and Metaculus ID -> Metaculus lookup.
+    # A branch that fails or exceeds RESEARCH_STAGE_TIMEOUTS falls back to its "nothing found" result.
+
+    def aggregate_news():
       # If you want to use AskNews, use the below
       full_article_context, formatted_articles = get_asknews_context(title)
       summary_report = formatted_articles
@@ -898,48 +2275,16 @@ def get_gpt_prediction(question_details: dict,question_id, num_runs: int = 1) ->
       summary_report=summary_report,
       options=options
   )
-      url = "https://llm-proxy.metaculus.com/proxy/anthropic/v1/messages/"
-      headers = {
-          "Authorization": f"Token {METACULUS_TOKEN}",
-          "anthropic-version": "2023-06-01",
-          "Content-Type": "application/json"
-      }
-      json_code = {
-          "model": "claude-3-5-sonnet-20241022",
-          "max_tokens": 4096,
-          "temperature": 0.1,
-          "messages": [
-              {
-                  "role": "user",
-                  "content": content
-              }
-          ]
-      }
+      return call_llm_proxy(content, hedge="news_aggregation")
 
-      response = requests.post(url, headers=headers,json=json_code)
-      response.raise_for_status()
+    def search_prior_info(prior_prompt, stage):
+      assistant_prompt_prior = f"""
+Assume that today is {today}. You are an assistant to a superforecaster.
+You will receive a prompt to search the web.
+"""
 
-      response_data = response.json()
-      summary_report_agg = response_data['content'][0]['text']
 
-    else:
-      summary_report = ""
-
-    # Call betting lines generator
-
-  #  rationale = get_betting_lines(question_details)
-
-  # Call prior generator
-
-    prior_prompt = get_prior(question_details)
-
-    assistant_prompt_prior = f"""
-Assume that today is {today}. You are an assistant to a superforecaster.
-You will receive a prompt to search the web.
-"""
-
-
-    query_prior = f"""This is what the superforecaster asks of you: {prior_prompt}.
+      query_prior = f"""This is what the superforecaster asks of you: {prior_prompt}.
     For context, his question is: {title}
     Background:
     {background}
@@ -948,177 +2293,146 @@ You will receive a prompt to search the web.
     Fine_print:
     {fine_print}"""
 
-    messages_prior = [
-    {
-        "role": "system",
-        "content": assistant_prompt_prior,
-    },
-    {
-        "role": "user",
-        "content": query_prior,
-    },
-    ]
-
-    # Call Perplexity for prior info
-
-    prior_info = call_perplexity_with_messages(messages_prior)
-
-    # CALL PERPLEXITY AGAIN!
-
-    prior_prompt2 = get_prior(question_details)
-
-    assistant_prompt_prior = f"""
-Assume that today is {today}. You are an assistant to a superforecaster.
-You will receive a prompt to search the web.
-"""
-
-
-    query_prior = f"""This is what the superforecaster asks of you: {prior_prompt2}.
-    For context, his question is: {title}
-    Background:
-    {background}
-    Resolution criteria:
-    {resolution_criteria}
-    Fine_print:
-    {fine_print}"""
-
-    messages_prior = [
-    {
-        "role": "system",
-        "content": assistant_prompt_prior,
-    },
-    {
-        "role": "user",
-        "content": query_prior,
-    },
-    ]
-
-    # Call Perplexity for prior info
-
-    prior_info2 = call_perplexity_with_messages(messages_prior)
-
-    # Call Perplexity for Metaculus predictions
-    assistant_prompt_meta2 = """
+      messages_prior = [
+      {
+          "role": "system",
+          "content": assistant_prompt_prior,
+      },
+      {
+          "role": "user",
+          "content": query_prior,
+      },
+      ]
+
+      # Call Perplexity for prior info
+      return call_perplexity_with_messages(messages_prior, cache_salt=stage)
+
+    def search_meta_id():
+      # Call Perplexity for Metaculus predictions
+      assistant_prompt_meta2 = """
 You are an assistant to a superforecaster. You will provide the Metaculus ID to the question in the prompt. If you did not find a precise match but you did find a similar question, also return an ID without comment.
 If you found something, your answer consists of just the ID. If you didn't find anything, your answer consists only of the number 0. Please do not write anything else under any circumstance as it will destroy the prediction pipeline.
 IMPORTANT: YOUR LAST WORD MUST BE THE ID AND NOTHING ELSE. THIS IS VERY IMPORTANT!"""
-    query_meta = f"Search metaculus for questions similar to this one: {title}"
-    messages_meta = [
-        {
-            "role": "system",
-            "content": assistant_prompt_meta2,
-        },
-        {
-            "role": "user",
-            "content": query_meta,
-        },
-        ]
+      query_meta = f"Search metaculus for questions similar to this one: {title}"
+      messages_meta = [
+          {
+              "role": "system",
+              "content": assistant_prompt_meta2,
+          },
+          {
+              "role": "user",
+              "content": query_meta,
+          },
+          ]
 
-    meta_info2 = call_perplexity_with_messages(messages_meta)
-    meta_info2 =extract_meta_id(meta_info2)
-    try:
-        question_id = int(meta_info2)  # Convert to integer if meta_info2 is a valid ID
-    except ValueError:
-        print("Invalid question ID received from meta_info2.")
-        print(question_id)
-        question_id = 0
-    if question_id:
-        url = f"https://www.metaculus.com/api/posts/{question_id}/"
-        response = requests.get(url,headers={"Authorization": f"Token {METACULUS_TOKEN}"})
-        data = response.json()
-        if data.get('question', {}).get('type', {}) == "binary": # BINARY
-          prediction = get_community_prediction(question_id)
-          if prediction:
-            meta_title=f"Question Title: {prediction['title']}"
-            meta_mean=f"Mean Prediction: {prediction['mean']}"
-            meta_time=f"{prediction['resolution_date']}"
+      meta_info2 = call_perplexity_with_messages(messages_meta)
+      return extract_meta_id(meta_info2)
+
+    def lookup_meta_prediction(meta_id):
+      try:
+          meta_question_id = int(meta_id)  # Convert to integer if meta_id is a valid ID
+      except ValueError:
+          print("Invalid question ID received from meta_info2.")
+          print(meta_id)
+          meta_question_id = 0
+      if meta_question_id:
+          url = f"{API_BASE_URL}/posts/{meta_question_id}/"
+          response = http_request("metaculus", "GET", url,headers={"Authorization": f"Token {METACULUS_TOKEN}"})
+          data = response.json()
+          if data.get('question', {}).get('type', {}) == "binary": # BINARY
+            prediction = get_community_prediction(meta_question_id)
+            if prediction:
+              meta_title=f"Question Title: {prediction['title']}"
+              meta_mean=f"Mean Prediction: {prediction['mean']}"
+              meta_time=f"{prediction['resolution_date']}"
+            else:
+              meta_title=0
+              meta_mean=0
+              meta_time=0
+          elif data.get('question', {}).get('type', {}) == "numeric": # NUMERIC
+            prediction = extract_numeric_prediction(data)
+            if prediction:
+              meta_title=f"Question Title: {prediction['title']}"
+              meta_mean=f"Mean Prediction: {prediction['prediction']}, Upper quartile: {prediction['upper_quartile']}, Lower quartile: {prediction['lower_quartile']}"
+              meta_time=f"{prediction['resolution_date']}"
+            else:
+              meta_title=0
+              meta_mean=0
+              meta_time=0
           else:
-            meta_title=0
-            meta_mean=0
-            meta_time=0
-        elif data.get('question', {}).get('type', {}) == "numeric": # NUMERIC
-          prediction = extract_numeric_prediction(data)
-          if prediction:
-            meta_title=f"Question Title: {prediction['title']}"
-            meta_mean=f"Mean Prediction: {prediction['prediction']}, Upper quartile: {prediction['upper_quartile']}, Lower quartile: {prediction['lower_quartile']}"
-            meta_time=f"{prediction['resolution_date']}"
+              meta_title=0
+              meta_mean=0
+              meta_time=0
+      else:
+          meta_title=0
+          meta_mean=0
+          meta_time=0
+
+
+      print(f"\n\n--------META ID AND MEAN----------")
+      print(meta_title)
+      print(meta_mean)
+      print(meta_time)
+      print(title)
+      print(f"\n\n----END META ID----")
+
+      # Check whether betting lines are proper
+
+      if meta_title:
+          resolution_date = datetime.datetime.fromisoformat(meta_time.replace('Z', '+00:00'))
+          today_naive = datetime.datetime.strptime(today, "%Y-%m-%d")
+          today_aware = today_naive.replace(tzinfo=datetime.timezone.utc)
+
+          if today_aware < resolution_date:
+            return f"Metaculus probabilities for the question {meta_title} to resolve positively are {meta_mean}. "
           else:
-            meta_title=0
-            meta_mean=0
-            meta_time=0
-        else:
-            meta_title=0
-            meta_mean=0
-            meta_time=0
-    else:
-        meta_title=0
-        meta_mean=0
-        meta_time=0
-
-
-    print(f"\n\n--------META ID AND MEAN----------")
-    print(meta_title)
-    print(meta_mean)
-    print(meta_time)
-    print(title)
-    print(f"\n\n----END META ID----")
-
-# Check whether betting lines are proper
+            return "I did not find Metaculus predictions"
+      else:
+          return "I did not find Metaculus predictions"
 
-    if meta_title:
-        resolution_date = datetime.datetime.fromisoformat(meta_time.replace('Z', '+00:00'))
-        today_naive = datetime.datetime.strptime(today, "%Y-%m-%d")
-        today_aware = today_naive.replace(tzinfo=datetime.timezone.utc)
-
-        if today_aware < resolution_date:
-          meta_assistant=f"Metaculus probabilities for the question {meta_title} to resolve positively are {meta_mean}. "
-        else:
-          meta_assistant="I did not find Metaculus predictions"
+    # Call betting lines generator
 
+  #  rationale = get_betting_lines(question_details)
 
-    else:
-        meta_assistant="I did not find Metaculus predictions"
+    # name: (dependencies, function, fallback)
+    research_stages = {
+        "prior_prompt": ((), lambda: get_prior(question_details, cache_salt="prior_prompt"), title),
+        "prior_prompt2": ((), lambda: get_prior(question_details, cache_salt="prior_prompt2"), title),
+        "prior_info": (("prior_prompt",), lambda prior_prompt: search_prior_info(prior_prompt, "prior_info"), "No information found."),
+        "prior_info2": (("prior_prompt2",), lambda prior_prompt: search_prior_info(prior_prompt, "prior_info2"), "No information found."),
+        "meta_id": ((), search_meta_id, 0),
+        "meta_assistant": (("meta_id",), lookup_meta_prediction, "I did not find Metaculus predictions"),
+    }
+    if GET_NEWS == True:
+      research_stages["summary_report"] = ((), aggregate_news, "No information found.")
+
+    def research_stage_timed_out(name):
+      # The abandoned call may take retries times HTTP_TIMEOUT to fail, the breaker should not wait for it
+      if name in RESEARCH_STAGE_PROVIDERS:
+        record_circuit_failure(RESEARCH_STAGE_PROVIDERS[name], f"research stage {name} timed out")
+
+    research = run_stage_graph(
+        research_stages,
+        RESEARCH_STAGE_TIMEOUTS,
+        completed={name: checkpoint[f"research.{name}"] for name in research_stages if f"research.{name}" in checkpoint},
+        on_complete=lambda name, result: save_checkpoint_stage(question_id, f"research.{name}", result),
+        on_timeout=research_stage_timed_out,
+        span_prefix="research",
+        span_attributes={"question_id": question_id},
+    )
+    summary_report_agg = research.get("summary_report", "")
+    prior_info = research["prior_info"]
+    prior_info2 = research["prior_info2"]
+    meta_assistant = research["meta_assistant"]
 
     # print(f"\n\n--------META ASSISTANT----------")
     # print(meta_assistant)
     # print(f"\n\n----END LLM PROMPT----")
 
-    # Predictions from Metaculus API
-
-    # binary
-    url = "https://www.metaculus.com/api/posts/?tournaments=quarterly-cup&statuses=open&forecast_type=binary"
-    response = requests.get(url)
-    data = response.json()
-    questions_coarse = data['results']
-    question_ids_binary = [q['id'] for q in questions_coarse]
-
-    predictions_binary = []
-    for q_id in question_ids_binary:
-        prediction = get_community_prediction(q_id)
-        if prediction:
-          meta_title=f"Question Title: {prediction['title']}"
-          meta_mean=f"Mean Prediction: {prediction['mean']}"
-          predictions_binary.append(meta_title)
-          predictions_binary.append(meta_mean)
-
-    # numeric
-    url = "https://www.metaculus.com/api/posts/?tournaments=quarterly-cup&statuses=open&forecast_type=numeric"
-    response = requests.get(url)
-    data = response.json()
-    questions_coarse = data['results']
-    question_ids_numeric = [q['id'] for q in questions_coarse]
-
+    # Predictions from the Metaculus Quarterly Cup (shared by every question of the run, usually prefetched)
 
-    predictions_numeric = []
-    for q_id in question_ids_numeric:
-        url = f"https://www.metaculus.com/api/posts/{q_id}/"
-        response = requests.get(url)
-        data = response.json()
-        prediction = extract_numeric_prediction(data)
-        predictions_numeric.append(prediction)
-
-    predictions_full = predictions_binary
-    predictions_full.extend(predictions_numeric)
+    if predictions_full is None:
+      predictions_full = get_community_snapshot()
 
     ## Payload for Forecaster AI
 
@@ -1174,138 +2488,197 @@ IMPORTANT: YOUR LAST WORD MUST BE THE ID AND NOTHING ELSE. THIS IS VERY IMPORTAN
         print(content)
         print(f"\n\n----END LLM PROMPT----")
 
+    # Fact checker context, shared by all runs of the question
+    if question_type == "binary":
+      fact_checker_context = PROMPT_FACT_CHECKER.format(
+          title=title,
+          today=today,
+          background=background,
+          resolution_criteria=resolution_criteria,
+          fine_print=fine_print,
+          summary_report=summary_report_agg,
+          meta_assistant=meta_assistant,
+          prior_info=prior_info,
+          prior_info2=prior_info2,
+          predictions_full=predictions_full
+      )
+      fact_checker_task = PROMPT_FACT_CHECKER_TASK
+    if question_type == "numeric":
+      fact_checker_context = PROMPT_FACT_CHECKER_NUMERIC.format(
+          title=title,
+          today=today,
+          background=background,
+          resolution_criteria=resolution_criteria,
+          fine_print=fine_print,
+          summary_report=summary_report_agg,
+          meta_assistant=meta_assistant,
+          prior_info=prior_info,
+          prior_info2=prior_info2,
+          predictions_full=predictions_full,
+          lower_bound_message=lower_bound_message,
+          upper_bound_message=upper_bound_message
+      )
+      fact_checker_task = PROMPT_FACT_CHECKER_NUMERIC_TASK
+    if question_type == "multiple_choice":
+      fact_checker_context = PROMPT_FACT_CHECKER_MC.format(
+          title=title,
+          today=today,
+          background=background,
+          resolution_criteria=resolution_criteria,
+          fine_print=fine_print,
+          summary_report=summary_report_agg,
+          meta_assistant=meta_assistant,
+          prior_info=prior_info,
+          prior_info2=prior_info2,
+          predictions_full=predictions_full,
+          options=options
+      )
+      fact_checker_task = PROMPT_FACT_CHECKER_MC_TASK
+
+    # The same parsers the ensemble uses below, run on a streamed answer as soon as its text is complete
+    answer_extractor = {
+        "binary": extract_prediction_from_response_as_percentage_not_decimal,
+        "numeric": extract_percentiles_from_response,
+        "multiple_choice": lambda text: extract_option_probabilities_from_response(text, options),
+    }.get(question_type)
+
+    # Forecaster and fact checker are separate pipeline stages, each with its own retries,
+    # so a failing fact check never re-runs a forecaster call that already succeeded.
+    # Runs finished by an earlier, interrupted attempt are taken from the checkpoint.
+    # The first forecaster call and the first fact check write the prompt cache, the other runs read it
+    forecaster_warmup = PromptCacheWarmup()
+    fact_checker_warmup = PromptCacheWarmup()
+
+    def run_forecaster(i, on_rationale=None):
+        rationale = checkpoint.get(f"forecaster.{i}")
+        if rationale is None:
+          # The run index is part of the cache key so every run keeps its own answer.
+          # The prompt is the same for every run, so all of it is sent as the cached prefix.
+          rationale = forecaster_warmup.run(lambda on_start: call_with_retries(
+              call_llm_proxy,
+              "",
+              cache_salt=f"forecaster-{i}",
+              cache_prefix=content,
+              answer_extractor=answer_extractor,
+              # A streamed rationale goes to the fact checker before its connection has closed
+              on_answer=(lambda answer, text: on_rationale(i, text)) if on_rationale else None,
+              hedge="forecaster",
+              on_start=on_start,
+          ))
+          save_checkpoint_stage(question_id, f"forecaster.{i}", rationale)
+        return rationale
+
+    def run_fact_checker(i, rationale):
+        rationale2 = checkpoint.get(f"fact_checker.{i}")
+        if rationale2 is None:
+          # Fact Checker: the shared context is the cached prefix, the rationale the per-run suffix
+          content_fact_checker = fact_checker_task.format(rationale=rationale, options=options)
+          rationale2 = fact_checker_warmup.run(lambda on_start: call_with_retries(
+              call_llm_proxy,
+              content_fact_checker,
+              cache_salt=f"fact-checker-{i}",
+              cache_prefix=fact_checker_context,
+              answer_extractor=None if question_type == "numeric" else answer_extractor,
+              hedge="fact_checker",
+              on_start=on_start,
+          ))
+          save_checkpoint_stage(question_id, f"fact_checker.{i}", rationale2)
+        return rationale, rationale2
+
+    def run_ensemble_runs(run_indices):
+        # Two stage pipeline: every finished forecaster run is handed straight to the fact checker
+        # pool, so fact checks overlap the forecaster runs still in flight. A streamed rationale is
+        # handed over as soon as its answer is complete. Results come back in run order.
+        run_indices = list(run_indices)
+        if not run_indices:
+          return []
+        workers = len(run_indices)
+        with ThreadPoolExecutor(max_workers=workers) as forecaster_pool, ThreadPoolExecutor(max_workers=workers) as fact_checker_pool:
+          research_keys = [f"research.{name}" for name in research_stages]
+          fact_checker_futures = {}
+          handoff_lock = threading.Lock()
+
+          def start_fact_checker(i, rationale):
+              with handoff_lock:
+                  if i in fact_checker_futures:
+                      return
+                  fact_checker = traced(
+                      run_fact_checker, "fact_checker", question_id=question_id, key=f"fact_checker.{i}", deps=[f"forecaster.{i}"]
+                  )
+                  fact_checker_futures[i] = fact_checker_pool.submit(fact_checker, i, rationale)
+
+          forecaster_futures = {
+              forecaster_pool.submit(
+                  traced(run_forecaster, "forecaster", question_id=question_id, key=f"forecaster.{i}", deps=research_keys),
+                  i,
+                  start_fact_checker,
+              ): i
+              for i in run_indices
+          }
+          for future in as_completed(forecaster_futures):
+              start_fact_checker(forecaster_futures[future], future.result())
+          return [fact_checker_futures[i].result() for i in run_indices]
+
     probabilities = []
     rationales = []
 
-    for i in range(num_runs):
-        # Retry logic
-        max_retries = 10
-        retry_delay = 5
-        for attempt in range(max_retries):
-            try:
-                url = "https://llm-proxy.metaculus.com/proxy/anthropic/v1/messages/"
-
-                headers = {
-                    "Authorization": f"Token {METACULUS_TOKEN}",
-                    "anthropic-version": "2023-06-01",
-                    "Content-Type": "application/json"
-                }
-
-                json_code = {
-                    "model": "claude-3-5-sonnet-20241022",
-                    "max_tokens": 4096,
-                    "temperature": 0.1,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": content
-                        }
-                    ]
-                }
-                response = requests.post(url, headers=headers,json=json_code)
-                response.raise_for_status()
-                response_data = response.json()
-                rationale = response_data['content'][0]['text']
-
-                # Fact Checker
-                if question_type == "binary":
-                  content_fact_checker = PROMPT_FACT_CHECKER.format(
-                        title=title,
-                        today=today,
-                        background=background,
-                        resolution_criteria=resolution_criteria,
-                        fine_print=fine_print,
-                        summary_report=summary_report_agg,
-                        meta_assistant=meta_assistant,
-                        prior_info=prior_info,
-                        prior_info2=prior_info2,
-                        rationale=rationale,
-                        predictions_full=predictions_full
-                    )
-                if question_type == "numeric":
-                  content_fact_checker = PROMPT_FACT_CHECKER_NUMERIC.format(
-                        title=title,
-                        today=today,
-                        background=background,
-                        resolution_criteria=resolution_criteria,
-                        fine_print=fine_print,
-                        summary_report=summary_report_agg,
-                        meta_assistant=meta_assistant,
-                        prior_info=prior_info,
-                        prior_info2=prior_info2,
-                        rationale=rationale,
-                        predictions_full=predictions_full,
-                        lower_bound_message=lower_bound_message,
-                        upper_bound_message=upper_bound_message
-                    )
-                if question_type == "multiple_choice":
-                  content_fact_checker = PROMPT_FACT_CHECKER_MC.format(
-                        title=title,
-                        today=today,
-                        background=background,
-                        resolution_criteria=resolution_criteria,
-                        fine_print=fine_print,
-                        summary_report=summary_report_agg,
-                        meta_assistant=meta_assistant,
-                        prior_info=prior_info,
-                        prior_info2=prior_info2,
-                        rationale=rationale,
-                        predictions_full=predictions_full,
-                        options=options
-                    )
-                json_code = {
-                    "model": "claude-3-5-sonnet-20241022",
-                    "max_tokens": 4096,
-                    "temperature": 0.1,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": content_fact_checker
-                        }
-                    ]
-                }
-                response = requests.post(url, headers=headers,json=json_code)
-                response.raise_for_status()
-                response_data = response.json()
-                rationale2 = response_data['content'][0]['text']
-                break
-            except requests.exceptions.RequestException as e:
-                print(f"Request failed (Attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                else:
-                    raise
-        if question_type == "binary":
-          probability = extract_prediction_from_response_as_percentage_not_decimal(rationale2)
-          probabilities.append(probability)
-        if question_type == "multiple_choice":
-          option_probabilities = (
-          extract_option_probabilities_from_response(rationale2, options)
-          )
-          probabilities.append(option_probabilities)
-        if question_type == "numeric":
-          percentile_values = (extract_percentiles_from_response(rationale))
-          probabilities.append(percentile_values)
-        rationales.append(rationale)
-        rationales.append(rationale2)
+    # All runs use the same content and are independent, so they are dispatched at once.
+    # Results are collected in run order, which keeps the average independent of completion order.
+    # With ADAPTIVE_ENSEMBLE, ENSEMBLE_MIN_RUNS runs go out first and more are only added
+    # (one at a time, up to num_runs) while the runs disagree by more than ENSEMBLE_TOLERANCE.
+    if ADAPTIVE_ENSEMBLE:
+      runs_planned = min(max(1, ENSEMBLE_MIN_RUNS), num_runs)
+    else:
+      runs_planned = num_runs
+    while True:
+      ensemble_results = run_ensemble_runs(range(len(probabilities), runs_planned))
+
+      for rationale, rationale2 in ensemble_results:
+          if question_type == "binary":
+            probability = extract_prediction_from_response_as_percentage_not_decimal(rationale2)
+            probabilities.append(probability)
+          if question_type == "multiple_choice":
+            option_probabilities = (
+            extract_option_probabilities_from_response(rationale2, options)
+            )
+            probabilities.append(option_probabilities)
+          if question_type == "numeric":
+            percentile_values = (extract_percentiles_from_response(rationale))
+            probabilities.append(percentile_values)
+          rationales.append(rationale)
+          rationales.append(rationale2)
+
+      if runs_planned >= num_runs:
+        break
+      if question_type == "numeric":
+        spread = ensemble_spread(question_type, probabilities, scaling, open_upper_bound, open_lower_bound)
+      else:
+        spread = ensemble_spread(question_type, probabilities)
+      print(f"Ensemble spread after {runs_planned} runs: {spread}")
+      if spread <= ENSEMBLE_TOLERANCE[question_type]:
+        break
+      runs_planned += 1
+
+    runs_used = f"Ensemble runs used: {len(probabilities)} of {num_runs}\n\n"
 
     if question_type == "binary":
       avg_probability = sum(probabilities) / len(probabilities)
       # Prepare the comment to post
-      comment = f"Average Probability: {avg_probability:.2f}%\n\nIndividual Probabilities: {probabilities}\n\nClaude's Answers:\n"
+      comment = runs_used + f"Average Probability: {avg_probability:.2f}%\n\nIndividual Probabilities: {probabilities}\n\nClaude's Answers:\n"
       for idx, rationale in enumerate(rationales):
           comment += f"Run {idx+1}:\n{rationale}\n\n"
       avg_probability=avg_probability/100
+      save_checkpoint_stage(question_id, "aggregation", [avg_probability, comment])
       return avg_probability, comment
 
     if question_type == "multiple_choice":
       num_options = len(probabilities[0])  # Assuming all sub-lists have the same length
       option_probabilities = [sum(sublist[i] for sublist in probabilities) / len(probabilities) for i in range(num_options)]
-      comment = f"EXTRACTED_PROBABILITIES: {option_probabilities}\n\nClaude's Answers:\n"
+      comment = runs_used + f"EXTRACTED_PROBABILITIES: {option_probabilities}\n\nClaude's Answers:\n"
       for idx, rationale in enumerate(rationales):
           comment += f"Run {idx+1}:\n{rationale}\n\n"
       probability_yes_per_category = generate_multiple_choice_forecast(options, option_probabilities)
+      save_checkpoint_stage(question_id, "aggregation", [probability_yes_per_category, comment])
       return probability_yes_per_category, comment
 
     if question_type == "numeric":
@@ -1313,7 +2686,7 @@ IMPORTANT: YOUR LAST WORD MUST BE THE ID AND NOTHING ELSE. THIS IS VERY IMPORTAN
       for percentile in probabilities[0].keys():  # Assuming all dictionaries have the same percentiles
             values = [d.get(percentile, 0) for d in probabilities]  # Get values for the current percentile from all dictionaries
             percentile_values[percentile] = sum(values) / len(values)  # Calculate average
-      comment = f"Extracted Percentile_values: {percentile_values}%\n\nClaude's Answers:\n"
+      comment = runs_used + f"Extracted Percentile_values: {percentile_values}%\n\nClaude's Answers:\n"
       for idx, rationale in enumerate(rationales):
           comment += f"Run {idx+1}:\n{rationale}\n\n"
       print(f"Extracted Percentile_values: {percentile_values}")
@@ -1321,18 +2694,56 @@ IMPORTANT: YOUR LAST WORD MUST BE THE ID AND NOTHING ELSE. THIS IS VERY IMPORTAN
       print(f"Open upper bound: {open_upper_bound}")
       print(f"Open lower bound: {open_lower_bound}")
 
-      cdf = generate_continuous_cdf(percentile_values, question_type, open_upper_bound, open_lower_bound, scaling)
+      if NUMERIC_AGGREGATION == "percentile_mean":
+        cdf = generate_continuous_cdf(percentile_values, question_type, open_upper_bound, open_lower_bound, scaling)
+      else:
+        percentile_keys = list(probabilities[0].keys())
+        percentile_array = [[d.get(percentile, 0) for percentile in percentile_keys] for d in probabilities]
+        _, pooled_cdf = generate_cdf_batch(
+            percentile_array, percentile_keys, scaling, open_upper_bound, open_lower_bound, aggregation=NUMERIC_AGGREGATION
+        )
+        cdf = pooled_cdf.tolist()
 
+      save_checkpoint_stage(question_id, "aggregation", [cdf, comment])
       return cdf, comment
 
 
+def ensemble_spread(
+    question_type: str,
+    forecasts: list,
+    scaling: dict | None = None,
+    open_upper_bound: bool = True,
+    open_lower_bound: bool = True,
+) -> float:
+    """
+    Largest disagreement between two ensemble runs: the range of the probabilities in
+    percentage points for binary questions, the L1 distance between the normalized option
+    probabilities for multiple choice and the mean absolute distance between the CDFs for numeric.
+    """
+    import numpy as np
+    if len(forecasts) < 2:
+        return 0.0
+    if question_type == "binary":
+        return float(max(forecasts) - min(forecasts))
+    if question_type == "multiple_choice":
+        option_probabilities = np.array(forecasts, dtype=float)
+        option_probabilities /= option_probabilities.sum(axis=1, keepdims=True)
+        distances = np.abs(option_probabilities[:, np.newaxis] - option_probabilities[np.newaxis]).sum(axis=-1)
+        return float(distances.max())
+    percentile_keys = list(forecasts[0].keys())
+    percentile_array = [[d.get(percentile, 0) for percentile in percentile_keys] for d in forecasts]
+    cdfs, _ = generate_cdf_batch(percentile_array, percentile_keys, scaling, open_upper_bound, open_lower_bound)
+    distances = np.abs(cdfs[:, np.newaxis] - cdfs[np.newaxis]).mean(axis=-1)
+    return float(distances.max())
+
+
 # Updated function to match your previous Perplexity setup
-def call_perplexity_with_messages(messages: list) -> str:
+def call_perplexity_with_messages(messages: list, cache_salt: str | None = None) -> str:
     PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
     if not PERPLEXITY_API_KEY:
         print("PERPLEXITY_API_KEY is not set.")
         return "No information found."
-    url = "https://api.perplexity.ai/chat/completions"
+    url = PERPLEXITY_API_URL
     api_key = PERPLEXITY_API_KEY
     headers = {
         "accept": "application/json",
@@ -1343,15 +2754,19 @@ def call_perplexity_with_messages(messages: list) -> str:
         "model": "llama-3.1-sonar-huge-128k-online",
         "messages": messages,
     }
-    response = requests.post(url=url, json=payload, headers=headers)
-    if not response.ok:
-        print("Error fetching data from Perplexity:", response.text)
+    try:
+        response_data = cached_llm_post("perplexity", url, headers, payload, cache_salt)
+    except requests.exceptions.HTTPError as e:
+        print("Error fetching data from Perplexity:", e.response.text)
         return "No information found."
-    content = response.json()["choices"][0]["message"]["content"]
+    except CircuitOpenError as e:
+        print(e)
+        return "No information found."
+    content = response_data["choices"][0]["message"]["content"]
     return content
 
 
-def get_prior(question_details: dict) -> str:
+def get_prior(question_details: dict, cache_salt: str | None = None) -> str:
 
     today = datetime.datetime.now().strftime("%Y-%m-%d")
     title = question_details["title"]
@@ -1378,40 +2793,18 @@ def get_prior(question_details: dict) -> str:
         print(content)
         print(f"\n\n----END PRIOR PROMPT----")
 
-    url = "https://llm-proxy.metaculus.com/proxy/anthropic/v1/messages/"
-
-    headers = {
-        "Authorization": f"Token {METACULUS_TOKEN}",
-        "anthropic-version": "2023-06-01",
-        "Content-Type": "application/json"
-    }
-
-    json_code = {
-        "model": "claude-3-5-sonnet-20241022",
-        "max_tokens": 4096,
-        "messages": [
-            {
-                "role": "user",
-                "content": content
-            }
-        ]
-    }
-    response = requests.post(url, headers=headers,json=json_code)
-    print(response)
-    response.raise_for_status()
-    response_data = response.json()
-    rationale = response_data['content'][0]['text']
+    rationale = call_llm_proxy(content, temperature=None, cache_salt=cache_salt, hedge="prior")
     print(rationale)
     return rationale
 
 def get_community_prediction(question_id):
     """Get latest community prediction for a Metaculus question"""
-    url = f"https://www.metaculus.com/api2/questions/{question_id}/"
+    url = f"{API_BASE_URL2}/questions/{question_id}/"
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
 
-    response = requests.get(url, headers=headers)
+    response = http_request("metaculus", "GET", url, headers=headers)
     data = response.json()
 
     # Get the prediction history
@@ -1441,6 +2834,97 @@ def get_community_prediction(question_id):
             'resolution_date': resolution_time
         }
     return None
+
+COMMUNITY_SNAPSHOT_PATH = os.path.join(CACHE_DIR, "community_snapshot.json")
+_community_snapshot = None
+_community_snapshot_fetched_at = 0
+_community_snapshot_lock = threading.Lock()
+
+def fetch_quarterly_cup_predictions() -> list:
+    """
+    Crawl the open Quarterly Cup questions and collect their community predictions.
+    """
+    # binary
+    url = f"{API_BASE_URL}/posts/?tournaments=quarterly-cup&statuses=open&forecast_type=binary"
+    response = http_request("metaculus", "GET", url)
+    data = response.json()
+    questions_coarse = data['results']
+    question_ids_binary = [q['id'] for q in questions_coarse]
+
+    predictions_binary = []
+    for q_id in question_ids_binary:
+        prediction = get_community_prediction(q_id)
+        if prediction:
+          meta_title=f"Question Title: {prediction['title']}"
+          meta_mean=f"Mean Prediction: {prediction['mean']}"
+          predictions_binary.append(meta_title)
+          predictions_binary.append(meta_mean)
+
+    # numeric
+    url = f"{API_BASE_URL}/posts/?tournaments=quarterly-cup&statuses=open&forecast_type=numeric"
+    response = http_request("metaculus", "GET", url)
+    data = response.json()
+    questions_coarse = data['results']
+    question_ids_numeric = [q['id'] for q in questions_coarse]
+
+    predictions_numeric = []
+    for q_id in question_ids_numeric:
+        url = f"{API_BASE_URL}/posts/{q_id}/"
+        response = http_request("metaculus", "GET", url)
+        data = response.json()
+        prediction = extract_numeric_prediction(data)
+        predictions_numeric.append(prediction)
+
+    predictions_full = predictions_binary
+    predictions_full.extend(predictions_numeric)
+    return predictions_full
+
+def get_community_snapshot() -> list:
+    """
+    Return the Quarterly Cup predictions block that is handed to every question.
+    The cup is crawled at most once per COMMUNITY_SNAPSHOT_TTL seconds; the result is kept
+    in memory (for the daemon) and on disk (for later runs).
+    """
+    global _community_snapshot, _community_snapshot_fetched_at
+    with _community_snapshot_lock:
+        if _community_snapshot is not None and time.time() - _community_snapshot_fetched_at < COMMUNITY_SNAPSHOT_TTL:
+            return _community_snapshot
+
+        try:
+            with open(COMMUNITY_SNAPSHOT_PATH) as f:
+                cached = json.load(f)
+            if time.time() - cached["fetched_at"] < COMMUNITY_SNAPSHOT_TTL:
+                print(f"Using cached Quarterly Cup snapshot from {COMMUNITY_SNAPSHOT_PATH}")
+                _community_snapshot = cached["predictions_full"]
+                _community_snapshot_fetched_at = cached["fetched_at"]
+                return _community_snapshot
+        except (OSError, ValueError, KeyError):
+            pass  # No usable snapshot on disk, crawl the cup below
+
+        predictions_full = fetch_quarterly_cup_predictions()
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(COMMUNITY_SNAPSHOT_PATH, "w") as f:
+                json.dump({"fetched_at": time.time(), "predictions_full": predictions_full}, f)
+        except OSError as e:
+            print(f"Could not write Quarterly Cup snapshot: {e}")
+        _community_snapshot = predictions_full
+        _community_snapshot_fetched_at = time.time()
+        return _community_snapshot
+
+def prefetch_community_snapshot() -> None:
+    """
+    Load the Quarterly Cup snapshot in the background. The cup crawl then overlaps the research
+    stage of the first questions instead of delaying their start; get_gpt_prediction picks the
+    snapshot up once research is done (and retries the crawl if the prefetch failed).
+    """
+    def load():
+        try:
+            get_community_snapshot()
+        except Exception as e:
+            print(f"Prefetching the Quarterly Cup snapshot failed: {e}")
+    threading.Thread(target=load, daemon=True).start()
+
 # Extract links from resolution criteria
 def extract_links(resolution_criteria):
     # This pattern matches URLs within markdown links [text](url) and bare URLs
@@ -1594,17 +3078,18 @@ def extract_percentiles_from_response(forecast_text: str) -> float:
         )
 
 
-def generate_continuous_cdf(
+def cdf_knots(
     percentile_values: dict,
-    question_type: str,
     open_upper_bound: bool,
     open_lower_bound: bool,
     scaling: dict,
-) -> list[float]:
+) -> tuple[np.ndarray, np.ndarray]:
     """
-    Returns: list[float]: A list of 201 float values representing the CDF.
+    Returns: the (values, cumulative probabilities) the CDF is interpolated through,
+    sorted by value, after clamping to closed bounds and adding the tail points.
     """
-
+    import numpy as np
+    percentile_values = dict(percentile_values)
     percentile_max = max(float(key) for key in percentile_values.keys())
     percentile_min = min(float(key) for key in percentile_values.keys())
     range_min = float(scaling.get("range_min"))
@@ -1631,92 +3116,251 @@ def generate_continuous_cdf(
     else:
         percentile_values[0] = range_min
 
-    print(f'Percentile_values {percentile_values.items()}')
+    # Map values to normalized percentiles; if two percentiles share a value, the higher one wins
+    value_percentiles = {value: float(key) / 100 for key, value in sorted(percentile_values.items())}
+    known_x = np.array(sorted(value_percentiles), dtype=float)
+    known_y = np.array([value_percentiles[value] for value in sorted(value_percentiles)], dtype=float)
+    return known_x, known_y
 
-    sorted_percentile_values = dict(sorted(percentile_values.items()))
-
-    # Normalize percentile keys
-    normalized_percentile_values = {}
-    for key, value in sorted_percentile_values.items():
-        percentile = float(key) / 100
-        normalized_percentile_values[percentile] = value
-
-    print(f'normalized_percentile_values: {normalized_percentile_values}')
-
-    value_percentiles = {value: key for key, value in normalized_percentile_values.items()}
-
-    print(f'value_percentiles: {value_percentiles}')
-
-
-    range_min = scaling.get("range_min")
-    range_max = scaling.get("range_max")
-    zero_point = scaling.get("zero_point")
 
+def cdf_locations(range_min, range_max, zero_point) -> np.ndarray:
+    """
+    Returns: the 201 question values the CDF is evaluated at (log spaced if zero_point is set).
+    """
+    import numpy as np
+    x = np.linspace(0, 1, 201)
+    if zero_point is None:
+        return range_min + (range_max - range_min) * x
+    deriv_ratio = (range_max - zero_point) / (range_min - zero_point)
+    # Scalar pow on purpose: the SIMD np.power can differ in the last bit from the scalar results
+    growth = np.array([deriv_ratio ** float(v) for v in x])
+    return range_min + (range_max - range_min) * (growth - 1) / (deriv_ratio - 1)
 
-    # function for log scaled questions
-    def generate_cdf_locations(range_min, range_max, zero_point):
-        if zero_point is None:
-            scale = lambda x: range_min + (range_max - range_min) * x
-        else:
-            deriv_ratio = (range_max - zero_point) / (range_min - zero_point)
-            scale = lambda x: range_min + (range_max - range_min) * (
-                deriv_ratio**x - 1
-            ) / (deriv_ratio - 1)
-        return [scale(x) for x in np.linspace(0, 1, 201)]
 
-    cdf_xaxis = generate_cdf_locations(range_min, range_max, zero_point)
+def interpolate_cdf(cdf_xaxis: np.ndarray, known_x: np.ndarray, known_y: np.ndarray) -> np.ndarray:
+    """
+    Piecewise linear interpolation through sorted, distinct knots, holding the end values
+    outside of them. Evaluates y0 + (x - x0) * (y1 - y0) / (x1 - x0) elementwise.
+    """
+    import numpy as np
+    cdf_xaxis = np.asarray(cdf_xaxis, dtype=float)
+    n = len(known_x)
+    if n == 1:
+        return np.full(cdf_xaxis.shape, known_y[0])
+    # index of the first knot >= x
+    idx = np.searchsorted(known_x, cdf_xaxis, side="left")
+    upper = np.clip(idx, 1, n - 1)
+    x0, x1 = known_x[upper - 1], known_x[upper]
+    y0, y1 = known_y[upper - 1], known_y[upper]
+    continuous_cdf = y0 + (cdf_xaxis - x0) * (y1 - y0) / (x1 - x0)
+    exact = known_x[np.minimum(idx, n - 1)] == cdf_xaxis
+    continuous_cdf = np.where(exact, known_y[np.minimum(idx, n - 1)], continuous_cdf)
+    continuous_cdf = np.where(idx == 0, known_y[0], continuous_cdf)
+    continuous_cdf = np.where(idx == n, known_y[-1], continuous_cdf)
+    return continuous_cdf
 
-    print(f'range_min: {range_min}')
-    print(f'range_max: {range_max}')
-    print(f'zero_point: {zero_point}')
-    print(f'cdf_axis: {cdf_xaxis}\n')
 
+def check_cdf_constraints(continuous_cdf) -> list[str]:
+    """
+    Returns: a description of every Metaculus CDF constraint the CDF violates (empty if valid).
+    Checks in one pass over the steps that the CDF is increasing by at least CDF_MIN_STEP.
+    """
+    import numpy as np
+    steps = np.diff(np.asarray(continuous_cdf, dtype=float))
+    problems = []
+    if (steps < 0).any():
+        problems.append(f"CDF decreases at {int((steps < 0).sum())} points")
+    if (steps < CDF_MIN_STEP).any():
+        problems.append(f"CDF increases by less than {CDF_MIN_STEP} at {int((steps < CDF_MIN_STEP).sum())} points")
+    return problems
 
-    def linear_interpolation(x_values, xy_pairs):
-        # Sort the xy_pairs by x-values
-        sorted_pairs = sorted(xy_pairs.items())
 
-        # Extract sorted x and y values
-        known_x = [pair[0] for pair in sorted_pairs]
-        known_y = [pair[1] for pair in sorted_pairs]
+def generate_continuous_cdf(
+    percentile_values: dict,
+    question_type: str,
+    open_upper_bound: bool,
+    open_lower_bound: bool,
+    scaling: dict,
+) -> list[float]:
+    """
+    Returns: list[float]: A list of 201 float values representing the CDF.
+    """
+    return generate_continuous_cdfs([percentile_values], question_type, open_upper_bound, open_lower_bound, scaling)[0]
 
-        # Initialize the result list
-        y_values = []
 
-        for x in x_values:
-            # Check if x is exactly in the known x values
-            if x in known_x:
-                y_values.append(known_y[known_x.index(x)])
-            else:
-                # Find the indices of the two nearest known x-values
-                i = 0
-                while i < len(known_x) and known_x[i] < x:
-                    i += 1
+def generate_continuous_cdfs(
+    percentile_sets: list[dict],
+    question_type: str,
+    open_upper_bound: bool,
+    open_lower_bound: bool,
+    scaling: dict,
+) -> list[list[float]]:
+    """
+    Batch version of generate_continuous_cdf for several percentile sets of the same question.
+    Returns: one list of 201 CDF values per percentile set.
+    """
+    range_min = scaling.get("range_min")
+    range_max = scaling.get("range_max")
+    zero_point = scaling.get("zero_point")
+    cdf_xaxis = cdf_locations(range_min, range_max, zero_point)
+
+    print(f'range_min: {range_min}, range_max: {range_max}, zero_point: {zero_point}')
+
+    continuous_cdfs = []
+    for percentile_values in percentile_sets:
+        known_x, known_y = cdf_knots(percentile_values, open_upper_bound, open_lower_bound, scaling)
+        print(f'value_percentiles: {dict(zip(known_x.tolist(), known_y.tolist()))}')
+        continuous_cdf = interpolate_cdf(cdf_xaxis, known_x, known_y)
+        for problem in check_cdf_constraints(continuous_cdf):
+            print(f"Warning: {problem}")
+        continuous_cdfs.append(continuous_cdf.tolist())
+    return continuous_cdfs
+
+def generate_cdf_batch(
+    percentile_array,
+    percentiles,
+    scalings,
+    open_upper_bounds,
+    open_lower_bounds,
+    aggregation: str = "mixture",
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized CDF engine for many ensemble members and questions at once.
 
-                list_index_2 = i
+    percentile_array has shape (runs, percentiles) for one question or
+    (questions, runs, percentiles), with the values for the percentile keys in
+    {percentiles}. scalings and the open bounds are given per question (a single
+    value is used for every question). Each row is converted exactly like
+    generate_continuous_cdf does.
 
-                # If x is outside the range of known x-values, use the nearest endpoint
-                if i == 0:
-                    y_values.append(known_y[0])
-                elif i == len(known_x):
-                    y_values.append(known_y[-1])
-                else:
-                    # Perform linear interpolation
-                    x0, x1 = known_x[i-1], known_x[i]
-                    y0, y1 = known_y[i-1], known_y[i]
+    aggregation "mixture" pools the members by averaging their CDFs,
+    "percentile_mean" averages the percentile values first and converts the mean.
 
-                    # Linear interpolation formula
-                    y = y0 + (x - x0) * (y1 - y0) / (x1 - x0)
-                    y_values.append(y)
+    Returns: (cdfs of shape (questions, runs, 201), pooled cdfs of shape (questions, 201)),
+    without the questions axis for a 2-D input.
+    """
+    import numpy as np
+    if aggregation not in ("mixture", "percentile_mean"):
+        raise ValueError(f"Unknown CDF aggregation: {aggregation}")
+    values = np.asarray(percentile_array, dtype=float)
+    single_question = values.ndim == 2
+    if single_question:
+        values = values[np.newaxis]
+    num_questions, num_runs, num_percentiles = values.shape
+
+    def per_question(setting):
+        if isinstance(setting, (dict, bool, np.bool_)):
+            return [setting] * num_questions
+        return list(setting)
+
+    scalings = per_question(scalings)
+    open_upper = np.array(per_question(open_upper_bounds), dtype=bool)
+    open_lower = np.array(per_question(open_lower_bounds), dtype=bool)
+    range_min = np.array([float(scaling.get("range_min")) for scaling in scalings])
+    range_max = np.array([float(scaling.get("range_max")) for scaling in scalings])
+    cdf_xaxis = np.stack([
+        cdf_locations(scaling.get("range_min"), scaling.get("range_max"), scaling.get("zero_point"))
+        for scaling in scalings
+    ])
+
+    if aggregation == "percentile_mean":
+        rows = values.mean(axis=1)[:, np.newaxis]
+        pooled, _ = _cdf_rows(rows, percentiles, range_min, range_max, open_upper, open_lower, cdf_xaxis)
+        cdfs, _ = _cdf_rows(values, percentiles, range_min, range_max, open_upper, open_lower, cdf_xaxis)
+        pooled = pooled[:, 0]
+    else:
+        cdfs, _ = _cdf_rows(values, percentiles, range_min, range_max, open_upper, open_lower, cdf_xaxis)
+        pooled = cdfs.mean(axis=1)
 
-        return y_values
+    if single_question:
+        return cdfs[0], pooled[0]
+    return cdfs, pooled
 
-    continuous_cdf = linear_interpolation(cdf_xaxis, value_percentiles)
 
+def _cdf_rows(values, percentiles, range_min, range_max, open_upper, open_lower, cdf_xaxis):
+    """
+    Convert percentile rows of shape (questions, runs, percentiles) to CDFs of shape
+    (questions, runs, 201). Returns the CDFs and the sorted knot values.
+    """
+    import numpy as np
+    percentiles = np.asarray(percentiles, dtype=float)
+    num_questions, num_runs, _ = values.shape
+    # Per question settings, broadcast over runs and percentiles
+    range_min = range_min[:, np.newaxis, np.newaxis]
+    range_max = range_max[:, np.newaxis, np.newaxis]
+    open_upper = open_upper[:, np.newaxis, np.newaxis]
+    open_lower = open_lower[:, np.newaxis, np.newaxis]
+    range_size = range_max - range_min
+    buffer = np.where(range_size > 100, 1, 0.01 * range_size)
 
-    print(f'continuous_cdf: {continuous_cdf}')
+    # Adjust any values that are exactly at the bounds
+    clamped = np.where(~open_lower & (values <= range_min + buffer), range_min + buffer, values)
+    clamped = np.where(~open_upper & (values >= range_max - buffer), range_max - buffer, clamped)
+    keys = np.broadcast_to(percentiles, clamped.shape).copy()
+
+    # Tail points. A tail that is not added is a copy of the outermost knot, which leaves
+    # the interpolation unchanged; a tail on an existing key replaces that knot's value.
+    top = np.argmax(percentiles)
+    bottom = np.argmin(percentiles)
+    percentile_max = percentiles[top]
+    percentile_min = percentiles[bottom]
+    value_at_max = clamped[..., top:top + 1]
+    value_at_min = clamped[..., bottom:bottom + 1]
+
+    upper_key = np.where(open_upper, float(int(100 - (0.5 * (100 - percentile_max)))), 100.0)
+    upper_added = ~open_upper | (range_max > value_at_max)
+    lower_key = np.where(open_lower, float(int(0.5 * percentile_min)), 0.0)
+    lower_added = ~open_lower | (range_min < value_at_min)
+
+    upper_key = np.broadcast_to(upper_key, value_at_max.shape)
+    lower_key = np.broadcast_to(lower_key, value_at_min.shape)
+    upper_added = np.broadcast_to(upper_added, value_at_max.shape)
+    lower_added = np.broadcast_to(lower_added, value_at_min.shape)
+    upper_value = np.broadcast_to(range_max, value_at_max.shape)
+    lower_value = np.broadcast_to(range_min, value_at_min.shape)
+
+    # The upper tail is set before the lower one, as in cdf_knots
+    clamped = np.where(upper_added & (keys == upper_key), upper_value, clamped)
+    upper_added = upper_added & ~(keys == upper_key).any(axis=-1, keepdims=True)
+    clamped = np.where(lower_added & (keys == lower_key), lower_value, clamped)
+    lower_added = lower_added & ~(keys == lower_key).any(axis=-1, keepdims=True)
+
+    knot_x = np.concatenate([
+        np.where(lower_added, lower_value, clamped[..., bottom:bottom + 1]),
+        clamped,
+        np.where(upper_added, upper_value, clamped[..., top:top + 1]),
+    ], axis=-1)
+    knot_y = np.concatenate([
+        np.where(lower_added, lower_key, percentiles[bottom]),
+        keys,
+        np.where(upper_added, upper_key, percentile_max),
+    ], axis=-1) / 100
+
+    # Sort by value; if several percentiles share a value, the highest one wins
+    order = np.lexsort((knot_y, knot_x), axis=-1)
+    knot_x = np.take_along_axis(knot_x, order, axis=-1)
+    knot_y = np.take_along_axis(knot_y, order, axis=-1)
+    for k in range(knot_x.shape[-1] - 2, -1, -1):
+        knot_y[..., k] = np.where(knot_x[..., k] == knot_x[..., k + 1], knot_y[..., k + 1], knot_y[..., k])
+
+    # Row-wise version of interpolate_cdf
+    num_knots = knot_x.shape[-1]
+    x = np.broadcast_to(cdf_xaxis[:, np.newaxis, :], (num_questions, num_runs, cdf_xaxis.shape[-1]))
+    idx = (knot_x[..., np.newaxis, :] < x[..., np.newaxis]).sum(axis=-1)
+    upper = np.clip(idx, 1, num_knots - 1)
+    x0 = np.take_along_axis(knot_x, upper - 1, axis=-1)
+    x1 = np.take_along_axis(knot_x, upper, axis=-1)
+    y0 = np.take_along_axis(knot_y, upper - 1, axis=-1)
+    y1 = np.take_along_axis(knot_y, upper, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cdfs = y0 + (x - x0) * (y1 - y0) / (x1 - x0)
+    nearest = np.minimum(idx, num_knots - 1)
+    exact = np.take_along_axis(knot_x, nearest, axis=-1) == x
+    cdfs = np.where(exact, np.take_along_axis(knot_y, nearest, axis=-1), cdfs)
+    cdfs = np.where(idx == 0, knot_y[..., :1], cdfs)
+    cdfs = np.where(idx == num_knots, knot_y[..., -1:], cdfs)
+    return cdfs, knot_x
 
-    return continuous_cdf
 def extract_option_probabilities_from_response(forecast_text: str, options) -> float:
 
     # Helper function that returns a list of tuples with numbers for all lines with Percentile
@@ -1795,6 +3439,41 @@ def generate_multiple_choice_forecast(options, option_probabilities) -> dict:
 
     return probability_yes_per_category
 
+def iter_tournament_posts(tournament_id, page_size: int = 50, prefetch: bool = True):
+    """
+    Lazily yield every open post of the {tournament_id}, walking the offset pages of list_posts.
+    With {prefetch}, the next page is requested while the current one is being consumed.
+    """
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    seen_post_ids = set()  # pages are ordered by hotness, which can shift while paging
+    offset = 0
+    next_page = None
+    try:
+        while True:
+            if next_page is not None:
+                data = next_page.result()
+            else:
+                data = list_posts(tournament_id, offset=offset, count=page_size)
+            results = data["results"]
+            if "next" in data:
+                has_more = bool(data["next"])
+            else:
+                has_more = len(results) == page_size
+            offset += len(results)
+            next_page = None
+            if has_more and executor:
+                next_page = executor.submit(list_posts, tournament_id, offset, page_size)
+
+            for post in results:
+                if post["id"] not in seen_post_ids:
+                    seen_post_ids.add(post["id"])
+                    yield post
+            if not has_more or not results:
+                return
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
 def list_questions(tournament_id, offset=0, count=50) -> list[dict]:
     """
     List (all details) {count} questions from the {tournament_id}
@@ -1815,7 +3494,7 @@ def list_questions(tournament_id, offset=0, count=50) -> list[dict]:
         "include_description": "true",
     }
     url = f"{API_BASE_URL2}/questions/"
-    response = requests.get(url, **AUTH_HEADERS, params=url_qparams)
+    response = http_request("metaculus", "GET", url, **AUTH_HEADERS, params=url_qparams)
     if not response.ok:
         raise Exception(response.text)
     data = json.loads(response.content)
@@ -1826,7 +3505,9 @@ def get_post_details(post_id: int) -> dict:
     #"""
     url = f"{API_BASE_URL}/posts/{post_id}/"
     print(f"Getting details for {url}")
-    response = requests.get(
+    response = http_request(
+        "metaculus",
+        "GET",
         url,
         **AUTH_HEADERS,  # type: ignore
     )
@@ -1841,77 +3522,70 @@ TOURNAMENT_ID = 32627 # Q1 AI Benchmarking
 
 # @title Get all open questions from the tournament (TOURNAMENT_ID)
 
-posts = list_posts(tournament_id=TOURNAMENT_ID)
-
-print(posts["results"])
-
-post_dict = dict()
-for post in posts["results"]:
-  print(f'question_id: {post["question"]["id"]} post_id: {post["id"]}.  \n')
-  if question := post.get("question"):
-      # single question post
-      post_dict[post["id"]] = [question]
-
-#print(f'post_dict: {post_dict}')
-
-open_question_id_post_id = [] # [(question_id, post_id)]
-new_question_id_post_id = []
-new_questions_ids = []
-for post_id, questions in post_dict.items():
-    for question in questions:
-        if question.get("status") == "open":
-          print(
-              f"ID: {question['id']}\nQ: {question['title']}\nCloses: "
-              f"{question['scheduled_close_time']}"
-          )
-          open_question_id_post_id.append((question["id"], post_id))
-          post_details = get_post_details(post_id)
-          forecast_values = post_details["question"]["my_forecasts"]["latest"]
-          if not forecast_values:
-            new_questions_ids.append(question["id"])
-
-print(f"New questions without predictions: {len(new_questions_ids)}")
-print(new_questions_ids)
-
-new_question_id_post_id = [
-    entry for entry in open_question_id_post_id if entry[0] in new_questions_ids
-]
-
-print("Matching Entries:")
-for entry in new_question_id_post_id:
-    print(f"Question ID: {entry[0]}, Post ID: {entry[1]}")
-
-print(f'open_question_id_post_id: {open_question_id_post_id}')
+def iter_open_questions(tournament_id):
+  """
+  Yield (question_id, post_id) for the open questions of the tournament as soon as their page arrives.
+
+  With ONLY_NEW, questions the bot has already forecast are skipped. This is decided from the
+  local forecast ledger and the my_forecasts field of the post list. Only when neither knows
+  the question and the ledger is older than LEDGER_TTL are the post details fetched, concurrently.
+  """
+  ledger = load_forecast_ledger()
+  ledger_fresh = time.time() - ledger["verified_at"] < LEDGER_TTL
+  detail_executor = None
+  detail_futures = {}  # future -> (question_id, post_id)
+
+  try:
+    for post in iter_tournament_posts(tournament_id):
+      print(f'question_id: {post.get("question", {}).get("id")} post_id: {post["id"]}.  \n')
+      question = post.get("question")
+      if not question or question.get("status") != "open":
+        # group posts have no single question
+        continue
+      print(
+          f"ID: {question['id']}\nQ: {question['title']}\nCloses: "
+          f"{question['scheduled_close_time']}"
+      )
+      if ONLY_NEW:
+        if str(question["id"]) in ledger["questions"]:
+          continue
+        my_forecasts = question.get("my_forecasts")
+        if my_forecasts is not None:
+          # The post list already tells whether the bot has forecast this question
+          if my_forecasts.get("latest"):
+            record_forecast(question["id"], post["id"])
+            continue
+        elif not ledger_fresh:
+          if detail_executor is None:
+            detail_executor = ThreadPoolExecutor(max_workers=PROVIDER_CONCURRENCY["metaculus"])
+          detail_futures[detail_executor.submit(get_post_details, post["id"])] = (question["id"], post["id"])
+          continue
+        print(f"New question without prediction: Question ID: {question['id']}, Post ID: {post['id']}")
+      yield question["id"], post["id"]
+
+    for future in as_completed(detail_futures):
+      question_id, post_id = detail_futures[future]
+      post_details = future.result()
+      if post_details["question"]["my_forecasts"]["latest"]:
+        record_forecast(question_id, post_id)
+        continue
+      print(f"New question without prediction: Question ID: {question_id}, Post ID: {post_id}")
+      yield question_id, post_id
+    if ONLY_NEW and not ledger_fresh:
+      mark_forecast_ledger_verified()
+  finally:
+    if detail_executor:
+      detail_executor.shutdown(wait=False, cancel_futures=True)
 
 
 # Cell 4
-# The list of questions to forecast
-forecast_questions_ids = []
-if FORECAST_TOURNAMENT == True:
-    if ONLY_NEW:
-      forecast_questions_ids = new_question_id_post_id
-    else:
-      forecast_questions_ids = open_question_id_post_id
-else:
-  forecast_questions_ids = [(30270, 30477)]
-  # question_id: 30270 post_id: 30477 (Biden EO)
-  # question_id: 30300 post_id: 30516 (Trump)
-  # [(28571, 28571)] # (question_id, post_id)
-  # [(28997, 29077)] brazil
-  # (29480, 29608) elon
-  # (28953, 29028) arms sales
-  # (28571, 28571) SSE
-  # (29051, 29141) Influenza A
-  # (8529, 8529) Metaculus meetup
-  # (29050, 29140) covid hospitalization
-
-for question_id, post_id in forecast_questions_ids:
-
+def forecast_question(question_id: int, post_id: int, predictions_full: list | None = None) -> None:
+  """
+  Run the full forecasting pipeline for one question and submit the result.
+  Without {predictions_full} the Quarterly Cup snapshot is loaded once research is done.
+  """
   question_details = get_question_details(question_id)
   title = question_details["title"]
-  resolution_criteria = question_details["resolution_criteria"]
-  background = question_details["description"]
-  fine_print = question_details["fine_print"]
   question_type = question_details["type"]
   if question_type == "multiple_choice":
     options = question_details["options"]
@@ -1919,11 +3593,176 @@ for question_id, post_id in forecast_questions_ids:
 
   print(f"----------\nQuestion: {title}")
 
-  forecast, comment = get_gpt_prediction(question_details,question_id, num_runs)
+  with span("question", question_id=question_id, key="question"):
+    forecast, comment = get_gpt_prediction(question_details,question_id, num_runs, predictions_full)
 
   print(f"Forecast: {forecast}")
   print(f"Comment: {comment}")
   if SUBMIT_PREDICTION:
-      forecast_payload = create_forecast_payload(forecast, question_type)
-      post_question_prediction(question_details["id"], forecast_payload)
-      post_question_comment(post_id, comment)
+      checkpoint = load_checkpoint(question_id)
+      if "submission.forecast" not in checkpoint:
+        forecast_payload = create_forecast_payload(forecast, question_type)
+        if BATCH_SUBMISSIONS:
+          queue_forecast_submission(question_id, post_id, forecast_payload, comment)
+          return
+        post_question_prediction(question_details["id"], forecast_payload)
+        save_checkpoint_stage(question_id, "submission.forecast", True)
+        record_forecast(question_id, post_id)
+      if "submission.comment" not in checkpoint:
+        if BATCH_SUBMISSIONS:
+          queue_question_comment(question_id, post_id, comment)
+        else:
+          post_question_comment(post_id, comment)
+          clear_checkpoint(question_id)
+
+def forecast_questions(question_id_post_id, max_workers: int = MAX_WORKERS) -> None:
+  """
+  Forecast all (question_id, post_id) pairs, {max_workers} questions at a time.
+  {question_id_post_id} may be a lazy iterable; each question starts as soon as it is yielded.
+  A failing question does not stop the others; the first error is raised once all are
+  done and the queued submissions have been flushed.
+  """
+  errors = []
+  num_questions = 0
+  prefetch_community_snapshot()
+  try:
+    if max_workers <= 1:
+      for question_id, post_id in question_id_post_id:
+        num_questions += 1
+        try:
+          forecast_question(question_id, post_id)
+        except Exception as e:
+          print(f"Forecasting question {question_id} failed: {e}")
+          errors.append(e)
+        post_queued_forecasts(only_overdue=True)
+    else:
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for question_id, post_id in question_id_post_id:
+          num_questions += 1
+          futures[executor.submit(forecast_question, question_id, post_id)] = question_id
+        running = set(futures)
+        while running:
+          done, running = wait(running, timeout=SUBMISSION_MAX_DELAY, return_when=FIRST_COMPLETED)
+          for future in done:
+            try:
+              future.result()
+            except Exception as e:
+              print(f"Forecasting question {futures[future]} failed: {e}")
+              errors.append(e)
+          # A cron run can be cancelled when it overruns, so forecasts are not held until the end:
+          # they are posted when no question is running any more or once the oldest is overdue
+          post_queued_forecasts(only_overdue=any(future.running() for future in running))
+  finally:
+    # Submit whatever is still queued, even if a question failed
+    errors.extend(flush_submissions())
+  print(f"Forecast {num_questions} questions")
+  if errors:
+    raise errors[0]
+
+def print_run_summary() -> None:
+  """
+  Print cache, token, hedging and streaming statistics and the span report of the run.
+  """
+  import numpy as np
+  print(f"LLM cache: {llm_cache_stats['hits']} hits, {llm_cache_stats['misses']} misses, {llm_cache_stats['evictions']} evictions")
+  print(f"LLM tokens: {llm_usage_stats}")
+  if LLM_HEDGING:
+    print(f"LLM hedging: {llm_hedge_stats}")
+  print_run_report()
+  if llm_stream_stats:
+    time_to_first_token = [stats["time_to_first_token"] for stats in llm_stream_stats if stats["time_to_first_token"] is not None]
+    tokens_per_second = [stats["tokens_per_second"] for stats in llm_stream_stats if stats["tokens_per_second"] is not None]
+    if time_to_first_token and tokens_per_second:
+      print(f"LLM streaming: median time to first token {np.median(time_to_first_token):.2f}s, median {np.median(tokens_per_second):.1f} tokens/s")
+
+def reset_run_stats() -> None:
+  """
+  Start a new reporting period: the daemon treats every batch of forecast questions as one run.
+  """
+  with _llm_cache_lock:
+    for stats in (llm_cache_stats, llm_usage_stats, llm_hedge_stats):
+      for name in stats:
+        stats[name] = 0
+    llm_stream_stats.clear()
+  with _span_lock:
+    run_spans.clear()
+
+def run_daemon(tournament_id, max_workers: int = MAX_WORKERS) -> None:
+  """
+  Poll the tournament every DAEMON_POLL_INTERVAL seconds and forecast new questions as soon as they show up.
+  HTTP sessions, the Quarterly Cup snapshot and the provider rate limits stay warm between polls.
+  Questions that are still being forecast are not picked up twice, and finished ones are
+  submitted before the next poll, so the ledger already knows about them.
+  Stops after DAEMON_MAX_RUNTIME seconds (if set) or on Ctrl-C, after the running questions are done.
+  """
+  started = time.monotonic()
+  in_flight = {}  # future -> question_id
+  executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+  try:
+    while not DAEMON_MAX_RUNTIME or time.monotonic() - started < DAEMON_MAX_RUNTIME:
+      next_poll = time.monotonic() + DAEMON_POLL_INTERVAL
+      prefetch_community_snapshot()
+      try:
+        for question_id, post_id in iter_open_questions(tournament_id):
+          if question_id not in in_flight.values():
+            in_flight[executor.submit(forecast_question, question_id, post_id)] = question_id
+      except Exception as e:
+        print(f"Polling tournament {tournament_id} failed: {e}")
+
+      # Sleep until the next poll, collecting questions as they finish
+      while in_flight and time.monotonic() < next_poll:
+        done, _ = wait(in_flight, timeout=max(0, next_poll - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+          question_id = in_flight.pop(future)
+          try:
+            future.result()
+          except Exception as e:
+            print(f"Forecasting question {question_id} failed, retrying on a later poll: {e}")
+        # Finished questions are submitted right away, otherwise the next poll would find them again
+        for error in flush_submissions():
+          print(f"Submission failed: {error}")
+        if not in_flight:
+          print_run_summary()
+          reset_run_stats()
+      time.sleep(max(0, next_poll - time.monotonic()))
+  except KeyboardInterrupt:
+    print("Stopping daemon, waiting for running questions")
+  finally:
+    executor.shutdown(wait=True)
+    for error in flush_submissions():
+      print(f"Submission failed: {error}")
+
+def main() -> None:
+  """
+  Forecast the tournament (or the test questions below) once, or keep polling it with DAEMON_MODE.
+  """
+  if DAEMON_MODE and FORECAST_TOURNAMENT:
+    run_daemon(TOURNAMENT_ID)
+    return
+
+  # The list of questions to forecast
+  forecast_questions_ids = []
+  if FORECAST_TOURNAMENT == True:
+      # Questions are handed to the forecasting pipeline while later pages are still loading
+      forecast_questions_ids = iter_open_questions(TOURNAMENT_ID)
+  else:
+    forecast_questions_ids = [(30270, 30477)]
+    # question_id: 30270 post_id: 30477 (Biden EO)
+    # question_id: 30300 post_id: 30516 (Trump)
+    # [(28571, 28571)] # (question_id, post_id)
+    # [(28997, 29077)] brazil
+    # (29480, 29608) elon
+    # (28953, 29028) arms sales
+    # (28571, 28571) SSE
+    # (29051, 29141) Influenza A
+    # (8529, 8529) Metaculus meetup
+    # (29050, 29140) covid hospitalization
+
+  try:
+    forecast_questions(forecast_questions_ids)
+  finally:
+    print_run_summary()
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,182 @@
+"""
+Local stand-in for Metaculus, the LLM proxy, Perplexity and AskNews that replays the
+cassettes recorded by running main.py with CASSETTE_DIR set.
+
+    python replay_server.py cassettes --port 8765 --latency 0.5 --throttle-rate 0.05
+
+then point main.py at it with METACULUS_URL, LLM_PROXY_URL, PERPLEXITY_API_URL,
+ASKNEWS_API_URL and ASKNEWS_TOKEN_URL (http://127.0.0.1:8765/oauth2/token, answered with a
+dummy token). Requests are matched on method, path and JSON body (dates are ignored, so a
+cassette keeps working on later days). A request without an exact match gets the next
+recorded answer for the same method and path. Latency, server errors and 429s can be
+injected to see how the bot behaves against a slow or struggling provider.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_PATH = "/oauth2/token"
+REPLAY_TOKEN = {"access_token": "replay", "token_type": "bearer", "expires_in": 24 * 60 * 60, "scope": "news"}
+
+
+def interaction_key(method: str, path: str, body) -> str:
+    """
+    Match key of a request: method, path and the JSON body with dates blanked out.
+    """
+    body_text = json.dumps(body, sort_keys=True) if body is not None else ""
+    request_text = re.sub(r"\d{4}-\d{2}-\d{2}", "<date>", f"{method} {path} {body_text}")
+    return hashlib.sha256(request_text.encode()).hexdigest()
+
+
+class Cassettes:
+    """
+    Recorded interactions, served round robin per match key.
+    """
+    def __init__(self, cassette_dir: str):
+        self.exact = {}
+        self.by_path = {}
+        self.position = {}
+        self.lock = threading.Lock()
+        for file_name in sorted(os.listdir(cassette_dir)):
+            if not file_name.endswith(".jsonl"):
+                continue
+            with open(os.path.join(cassette_dir, file_name)) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    interaction = json.loads(line)
+                    key = interaction_key(interaction["method"], interaction["path"], interaction["body"])
+                    self.exact.setdefault(key, []).append(interaction)
+                    self.by_path.setdefault((interaction["method"], interaction["path"]), []).append(interaction)
+
+    def next_from(self, key, interactions: list) -> dict:
+        with self.lock:
+            position = self.position.get(key, 0)
+            self.position[key] = position + 1
+        return interactions[position % len(interactions)]
+
+    def find(self, method: str, path: str, body) -> tuple[dict | None, bool]:
+        """
+        Return (interaction, exact match) for a request, or (None, False) if the path was never recorded.
+        """
+        key = interaction_key(method, path, body)
+        if key in self.exact:
+            return self.next_from(key, self.exact[key]), True
+        if (method, path) in self.by_path:
+            return self.next_from((method, path), self.by_path[(method, path)]), False
+        return None, False
+
+
+def make_handler(cassettes: Cassettes, latency: float, error_rate: float, throttle_rate: float, retry_after: float, stats: dict):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def replay(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw_body = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw_body) if raw_body else None
+            except ValueError:
+                body = None
+            if self.command == "POST" and self.path == TOKEN_PATH:
+                # The AskNews OAuth token exchange is not recorded, any token will do
+                self.count("tokens")
+                return self.respond(200, "application/json", json.dumps(REPLAY_TOKEN))
+
+            if latency:
+                time.sleep(random.expovariate(1 / latency))
+
+            roll = random.random()
+            if roll < throttle_rate:
+                self.count("throttled")
+                return self.respond(429, "application/json", '{"detail": "throttled"}', {"Retry-After": str(retry_after)})
+            if roll < throttle_rate + error_rate:
+                self.count("errors")
+                return self.respond(503, "application/json", '{"detail": "unavailable"}')
+
+            interaction, exact = cassettes.find(self.command, self.path, body)
+            if interaction is None:
+                self.count("unmatched")
+                print(f"No recorded interaction for {self.command} {self.path}")
+                return self.respond(404, "application/json", '{"detail": "not recorded"}')
+            self.count("exact" if exact else "fallback")
+            self.respond(interaction["status"], interaction["content_type"], interaction["response"])
+
+        def count(self, outcome: str):
+            with stats["lock"]:
+                stats[outcome] = stats.get(outcome, 0) + 1
+
+        def respond(self, status: int, content_type: str, text: str, headers: dict | None = None):
+            data = text.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type or "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = replay
+        do_POST = replay
+        do_PUT = replay
+
+        def log_message(self, *args):
+            pass
+
+    return ReplayHandler
+
+
+def start_replay_server(
+    cassette_dir: str,
+    port: int = 0,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    throttle_rate: float = 0.0,
+    retry_after: float = 1.0,
+) -> ThreadingHTTPServer:
+    """
+    Serve {cassette_dir} on 127.0.0.1:{port} (0 picks a free port) from a background thread.
+    {latency} is the mean of an exponentially distributed delay per request; {error_rate} and
+    {throttle_rate} are the shares of requests answered with 503 and 429. Outcome counts are
+    kept in server.stats.
+    """
+    stats = {"lock": threading.Lock()}
+    handler = make_handler(Cassettes(cassette_dir), latency, error_rate, throttle_rate, retry_after, stats)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassette_dir")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean injected delay per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    args = parser.parse_args()
+
+    server = start_replay_server(
+        args.cassette_dir, args.port, args.latency, args.error_rate, args.throttle_rate, args.retry_after
+    )
+    print(f"Replaying {args.cassette_dir} on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print({name: count for name, count in server.stats.items() if name != "lock"})
+
+
+if __name__ == "__main__":
+    main()
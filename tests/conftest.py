@@ -0,0 +1,38 @@
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def span_log(tmp_path, monkeypatch):
+    # Spans of a test go to its own log instead of spans.jsonl in the working directory
+    monkeypatch.setattr(main, "SPAN_LOG_PATH", str(tmp_path / "spans.jsonl"))
+    monkeypatch.setattr(main, "_span_log_started", False)
+    monkeypatch.setattr(main, "run_spans", [])
+    return tmp_path / "spans.jsonl"
+
+
+@pytest.fixture
+def submissions(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(main, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "FORECAST_LEDGER_PATH", str(tmp_path / "forecast_ledger.json"))
+    monkeypatch.setattr(main, "SUBMIT_PREDICTION", True)
+    monkeypatch.setattr(main, "get_question_details", lambda question_id: {"id": question_id, "title": "Will A happen?", "type": "binary"})
+
+    def get_gpt_prediction(question_details, question_id, num_runs, predictions_full):
+        # Behaves like the real pipeline: a checkpointed aggregation is reused
+        checkpoint = main.load_checkpoint(question_id)
+        if "aggregation" in checkpoint:
+            return checkpoint["aggregation"]
+        main.save_checkpoint_stage(question_id, "aggregation", [0.4, "comment"])
+        return 0.4, "comment"
+
+    monkeypatch.setattr(main, "get_gpt_prediction", get_gpt_prediction)
+    posted = {"forecasts": [], "comments": []}
+    monkeypatch.setattr(main, "post_question_prediction", lambda question_id, payload: posted["forecasts"].append(question_id))
+    monkeypatch.setattr(
+        main, "post_question_predictions", lambda forecasts: {question_id: posted["forecasts"].append(question_id) for question_id, _ in forecasts}
+    )
+    monkeypatch.setattr(main, "post_question_comment", lambda post_id, comment: posted["comments"].append(post_id))
+    return posted
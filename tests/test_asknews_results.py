@@ -0,0 +1,51 @@
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def empty_results(monkeypatch):
+    monkeypatch.setattr(main, "_asknews_results", {})
+
+
+def test_expired_and_failed_retrievals_are_dropped_on_insert(monkeypatch):
+    monkeypatch.setattr(main, "fetch_asknews_context", lambda query: ("context", query))
+    main.get_asknews_context("Will A happen?")
+
+    def fail(query):
+        raise RuntimeError("AskNews is down")
+
+    monkeypatch.setattr(main, "fetch_asknews_context", fail)
+    with pytest.raises(RuntimeError):
+        main.get_asknews_context("Will B happen?")
+
+    started_at, future = main._asknews_results["will a happen"]
+    main._asknews_results["will a happen"] = (started_at - main.ASKNEWS_CACHE_TTL - 1, future)
+    monkeypatch.setattr(main, "fetch_asknews_context", lambda query: ("context", query))
+    main.get_asknews_context("Will C happen?")
+
+    assert list(main._asknews_results) == ["will c happen"]
+
+
+def test_fresh_retrievals_are_shared(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "fetch_asknews_context", lambda query: calls.append(query) or ("context", query))
+
+    main.get_asknews_context("Will A happen by March 3, 2025?")
+    main.get_asknews_context("Will A happen by April 1, 2025?")
+
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("Will X happen before March 2025?", "will x happen before"),
+        ("Who wins in the May 2025 election?", "who wins in the election"),
+        ("Will A happen by March 3, 2025?", "will a happen by"),
+        ("Will A happen by 3rd of March 2025?", "will a happen by"),
+        ("Will the Mayor 2025 budget pass?", "will the mayor 2025 budget pass"),
+    ],
+)
+def test_normalize_news_query_strips_dates(query, expected):
+    assert main.normalize_news_query(query) == expected
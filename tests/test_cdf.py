@@ -0,0 +1,89 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import main
+
+SAMPLED_POINTS = (0, 1, 40, 100, 137, 199, 200)
+
+# Expected values were produced by the loop based generate_continuous_cdf that the numpy
+# version replaced; they are compared exactly, the numpy version is meant to be bit-identical.
+CASES = {
+    "linear_closed": (
+        {10: 20, 20: 30, 40: 45, 60: 55, 80: 70, 90: 85},
+        False,
+        False,
+        {"range_min": 0, "range_max": 100, "zero_point": None},
+        [0.0, 0.0025, 0.1, 0.5, 0.78, 0.9966666666666667, 1.0],
+        99.50000000000003,
+    ),
+    "linear_open": (
+        {10: 120, 20: 250, 40: 400, 60: 520, 80: 700, 90: 880},
+        True,
+        True,
+        {"range_min": 0, "range_max": 1000, "zero_point": None},
+        [0.05, 0.052083333333333336, 0.16153846153846155, 0.5666666666666667, 0.7833333333333334, 0.9479166666666666, 0.95],
+        105.20000000000002,
+    ),
+    "linear_clamped": (
+        {10: -5, 20: -1, 40: 30, 60: 50, 80: 120, 90: 150},
+        False,
+        False,
+        {"range_min": 0, "range_max": 100, "zero_point": None},
+        [0.0, 0.1, 0.3310344827586207, 0.6, 0.713265306122449, 0.95, 1.0],
+        113.50000000000001,
+    ),
+    "log": (
+        {10: 3, 20: 8, 40: 25, 60: 60, 80: 200, 90: 450},
+        True,
+        False,
+        {"range_min": 1, "range_max": 1000, "zero_point": 0},
+        [0.0, 0.0017571083339671945, 0.11962143411069946, 0.4378444377239074, 0.6764301165246165, 0.9469137162718012, 0.95],
+        92.22997993891845,
+    ),
+    "log_flat": (
+        {10: 100000, 20: 200000, 40: 400000, 60: 600000, 80: 800000, 90: 900000},
+        False,
+        False,
+        {"range_min": 1, "range_max": 1000000, "zero_point": 0},
+        [0.0, 7.152002043781079e-08, 1.4849080415415291e-05, 0.000999009990099901, 0.012881624333174682, 0.933254300796991, 1.0],
+        14.982072059111626,
+    ),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_cdf_matches_the_loop_implementation(name):
+    percentile_values, open_upper_bound, open_lower_bound, scaling, expected_points, expected_sum = CASES[name]
+
+    cdf = main.generate_continuous_cdf(dict(percentile_values), "numeric", open_upper_bound, open_lower_bound, scaling)
+
+    assert len(cdf) == 201
+    assert [cdf[i] for i in SAMPLED_POINTS] == expected_points
+    assert sum(cdf) == expected_sum
+
+
+def test_batch_conversion_matches_single_conversion():
+    percentile_values, open_upper_bound, open_lower_bound, scaling, _, _ = CASES["log"]
+    other = {key: value * 1.5 for key, value in percentile_values.items()}
+
+    cdfs = main.generate_continuous_cdfs([percentile_values, other], "numeric", open_upper_bound, open_lower_bound, scaling)
+
+    assert cdfs == [
+        main.generate_continuous_cdf(dict(values), "numeric", open_upper_bound, open_lower_bound, scaling)
+        for values in (percentile_values, other)
+    ]
+
+
+def test_constraint_warnings(capsys):
+    percentile_values, open_upper_bound, open_lower_bound, scaling, _, _ = CASES["log_flat"]
+
+    cdf = main.generate_continuous_cdf(dict(percentile_values), "numeric", open_upper_bound, open_lower_bound, scaling)
+
+    assert main.check_cdf_constraints(cdf) == ["CDF increases by less than 5e-05 at 95 points"]
+    assert "Warning: CDF increases by less than 5e-05 at 95 points" in capsys.readouterr().out
+    assert main.check_cdf_constraints(CASES["linear_open"][4]) == []
+    assert main.check_cdf_constraints([0.0, 0.5, 0.4, 1.0]) == [
+        "CDF decreases at 1 points",
+        "CDF increases by less than 5e-05 at 1 points",
+    ]
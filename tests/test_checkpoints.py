@@ -0,0 +1,27 @@
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("batch_submissions", [False, True])
+def test_a_submitted_question_is_forecast_again_on_the_next_run(submissions, monkeypatch, batch_submissions):
+    monkeypatch.setattr(main, "BATCH_SUBMISSIONS", batch_submissions)
+
+    for _ in range(2):
+        main.forecast_question(1, 11, [])
+        assert main.flush_submissions() == []
+
+    assert submissions == {"forecasts": [1, 1], "comments": [11, 11]}
+    assert main.load_checkpoint(1) == {}
+
+
+def test_a_question_interrupted_after_its_forecast_only_posts_the_comment(submissions, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_SUBMISSIONS", False)
+    main.save_checkpoint_stage(1, "aggregation", [0.4, "comment"])
+    main.save_checkpoint_stage(1, "submission.forecast", True)
+
+    main.forecast_question(1, 11, [])
+
+    assert submissions == {"forecasts": [], "comments": [11]}
+    assert main.load_checkpoint(1) == {}
+
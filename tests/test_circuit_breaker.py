@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def breakers(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "CIRCUIT_BREAKER_PATH", str(tmp_path / "circuit_breakers.json"))
+    monkeypatch.setattr(main, "_circuit_breakers", None)
+    monkeypatch.setattr(main, "_circuit_probes", set())
+
+
+def test_timed_out_stages_are_reported():
+    release = threading.Event()
+    timed_out = []
+
+    results = main.run_stage_graph(
+        {"prior_info": ((), release.wait, "No information found."), "meta_id": ((), lambda: 7, 0)},
+        {"prior_info": 0.05},
+        on_timeout=timed_out.append,
+    )
+    release.set()
+
+    assert results == {"prior_info": "No information found.", "meta_id": 7}
+    assert timed_out == ["prior_info"]
+
+
+def test_timeouts_open_the_breaker():
+    for _ in range(main.CIRCUIT_BREAKER_THRESHOLD):
+        main.record_circuit_failure("perplexity", "research stage prior_info timed out")
+
+    with pytest.raises(main.CircuitOpenError):
+        main.circuit_call("perplexity", lambda: "not called")
+    # Providers without a breaker are never blocked
+    main.record_circuit_failure("llm_proxy", "timed out")
+    assert main.circuit_call("llm_proxy", lambda: "called") == "called"
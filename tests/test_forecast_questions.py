@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_a_failing_question_does_not_stop_the_others(submissions, monkeypatch, max_workers):
+    monkeypatch.setattr(main, "BATCH_SUBMISSIONS", False)
+    monkeypatch.setattr(main, "get_community_snapshot", lambda: [])
+    forecast_question = main.forecast_question
+
+    def flaky_forecast_question(question_id, post_id, predictions_full=None):
+        if question_id == 1:
+            raise RuntimeError("question 1 failed")
+        forecast_question(question_id, post_id, predictions_full)
+
+    monkeypatch.setattr(main, "forecast_question", flaky_forecast_question)
+
+    with pytest.raises(RuntimeError, match="question 1 failed"):
+        main.forecast_questions([(1, 11), (2, 12), (3, 13)], max_workers=max_workers)
+
+    assert sorted(submissions["forecasts"]) == [2, 3]
+
+
+def test_queued_forecasts_are_posted_while_other_questions_still_run(submissions, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_SUBMISSIONS", True)
+    monkeypatch.setattr(main, "SUBMISSION_MAX_DELAY", 0.05)
+    monkeypatch.setattr(main, "get_community_snapshot", lambda: [])
+    forecast_question = main.forecast_question
+    seen_while_running = []
+
+    def slow_forecast_question(question_id, post_id, predictions_full=None):
+        if question_id == 2:
+            deadline = time.monotonic() + 2
+            while 1 not in submissions["forecasts"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            seen_while_running.append(1 in submissions["forecasts"])
+        forecast_question(question_id, post_id, predictions_full)
+
+    monkeypatch.setattr(main, "forecast_question", slow_forecast_question)
+
+    main.forecast_questions([(1, 11), (2, 12)], max_workers=2)
+
+    assert seen_while_running == [True]
+    assert sorted(submissions["forecasts"]) == [1, 2]
+
+
+def test_questions_start_without_waiting_for_the_community_snapshot(submissions, monkeypatch):
+    crawl_done = threading.Event()
+    started_during_crawl = []
+    monkeypatch.setattr(main, "get_community_snapshot", lambda: crawl_done.wait(2) and [])
+    monkeypatch.setattr(
+        main, "forecast_question", lambda question_id, post_id, predictions_full=None: started_during_crawl.append(not crawl_done.is_set())
+    )
+
+    main.forecast_questions([(1, 11)], max_workers=1)
+    crawl_done.set()
+
+    assert started_during_crawl == [True]
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+ANSWER_SECONDS = 0.1
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(ANSWER_SECONDS)
+        body = json.dumps({"content": [{"type": "text", "text": "Probability: 40%"}], "usage": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def llm_url(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(main, "LLM_CACHE_BYPASS", True)
+    monkeypatch.setattr(main, "_llm_latencies", {})
+    monkeypatch.setitem(main._provider_buckets, "llm_proxy", main.TokenBucket(rate=1000, burst=1000))
+    # A single slot, so every call but the first one queues for it
+    monkeypatch.setitem(main._provider_semaphores, "llm_proxy", threading.BoundedSemaphore(1))
+    yield f"http://127.0.0.1:{server.server_port}/v1/messages"
+    server.shutdown()
+
+
+def test_hedge_latencies_are_wire_times_per_call_type(llm_url):
+    def call(i):
+        return main.cached_llm_post("llm_proxy", llm_url, {}, {"i": i}, hedge="prior")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(call, range(3)))
+
+    latencies = list(main._llm_latencies[("llm_proxy", "prior")])
+    assert len(latencies) == 3
+    assert max(latencies) < 2 * ANSWER_SECONDS
+    assert ("llm_proxy", "forecaster") not in main._llm_latencies
+    assert main.hedge_delay("llm_proxy", "forecaster") is None
+
+
+def test_waiting_for_a_slot_does_not_trigger_a_hedge(llm_url, monkeypatch):
+    monkeypatch.setattr(main, "LLM_HEDGING", True)
+    monkeypatch.setattr(main, "llm_hedge_stats", {"hedges": 0, "hedge_wins": 0})
+    monkeypatch.setitem(main._provider_semaphores, "llm_proxy", threading.BoundedSemaphore(2))
+    for _ in range(main.LLM_HEDGE_MIN_SAMPLES):
+        main.record_llm_latency("llm_proxy", "prior", 2 * ANSWER_SECONDS)
+
+    def call(i):
+        return main.cached_llm_post("llm_proxy", llm_url, {}, {"i": i}, hedge="prior")
+
+    # Eight calls on two slots: the last ones wait far longer than the hedge delay for a slot
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(call, range(8)))
+
+    assert main.llm_hedge_stats == {"hedges": 0, "hedge_wins": 0}
@@ -0,0 +1,43 @@
+import os
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "LLM_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "_llm_cache_index", {"bytes": None, "writes": 0})
+    return tmp_path
+
+
+def test_directory_is_only_scanned_when_needed(cache_dir, monkeypatch):
+    scans = []
+    evict = main.evict_llm_cache
+    monkeypatch.setattr(main, "evict_llm_cache", lambda: scans.append(1) or evict())
+
+    for i in range(5):
+        main.write_llm_cache(f"key-{i}", {"text": "x" * 100})
+
+    # The first write scans to learn the size, the others only update it
+    assert len(scans) == 1
+    assert main._llm_cache_index["bytes"] == sum(path.stat().st_size for path in cache_dir.iterdir())
+    assert main.read_llm_cache("key-3") == {"text": "x" * 100}
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_limit(cache_dir, monkeypatch):
+    monkeypatch.setattr(main, "LLM_CACHE_MAX_BYTES", 500)
+
+    for i in range(5):
+        main.write_llm_cache(f"key-{i}", {"text": "x" * 100})
+        used_at = time.time() - 100 + i
+        os.utime(cache_dir / f"key-{i}.json", (used_at, used_at))
+    main.write_llm_cache("key-5", {"text": "x" * 100})
+
+    assert main._llm_cache_index["bytes"] <= 500
+    assert (cache_dir / "key-5.json").exists()
+    assert not (cache_dir / "key-0.json").exists()
+    assert (cache_dir / "key-4.json").exists()
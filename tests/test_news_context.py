@@ -0,0 +1,72 @@
+import datetime
+import uuid
+
+import pytest
+
+search_news_items = pytest.importorskip("asknews_sdk.dto.news")
+
+import main
+
+
+def make_article(title: str, summary: str, url: str, days_old: float) -> "search_news_items.SearchResponseDictItem":
+    return search_news_items.SearchResponseDictItem.model_validate(
+        {
+            "article_url": url,
+            "article_id": str(uuid.uuid4()),
+            "classification": "Business",
+            "country": "US",
+            "source_id": "reuters",
+            "page_rank": 1,
+            "domain_url": "reuters.com",
+            "eng_title": title,
+            "entities": {},
+            "keywords": [],
+            "language": "en",
+            "pub_date": datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days_old),
+            "summary": summary,
+            "title": title,
+            "sentiment": 0,
+            "as_string_key": title,
+        }
+    )
+
+
+STORY = (
+    "The central bank announced on Wednesday that it will cut interest rates by a quarter point "
+    "citing slowing inflation and weaker labour markets across the region"
+)
+
+
+def test_format_asknews_context_accepts_sdk_articles():
+    hot = [
+        make_article("Fed cuts rates", STORY, "https://www.reuters.com/a/?utm_source=feed", 0),
+        make_article("Fed cuts rates by 25bp", STORY.replace("Wednesday", "Wednesday afternoon"), "https://apnews.com/b", 0.2),
+    ]
+    historical = [
+        make_article("Fed cuts rates", STORY, "http://reuters.com/a", 0),
+        make_article(
+            "Inflation falls again",
+            "Inflation fell for the third month in a row according to the statistics office",
+            "https://ft.com/d",
+            40,
+        ),
+    ]
+    assert not isinstance(hot[0].article_url, str)
+
+    context = main.format_asknews_context(hot, historical)
+
+    assert context.count("**Fed cuts rates") == 1
+    assert "**Inflation falls again**" in context
+    assert "reuters.com/a" in context
+
+
+def test_format_asknews_context_respects_token_budget():
+    hot = [make_article(f"Story {i}", f"Unrelated summary number {i} " * 20, f"https://example.com/{i}", i) for i in range(5)]
+
+    context = main.format_asknews_context(hot, [], token_budget=200)
+
+    assert 0 < context.count("**Story") < 5
+
+
+def test_canonical_article_url_drops_tracking_and_www():
+    assert main.canonical_article_url("https://www.Reuters.com/a/?utm_source=x&b=2#top") == "reuters.com/a?b=2"
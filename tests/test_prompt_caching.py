@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+GENERATION_SECONDS = 0.5
+USAGE = {"input_tokens": 5, "cache_creation_input_tokens": 100, "cache_read_input_tokens": 0, "output_tokens": 7}
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append({"at": time.monotonic(), "headers": dict(self.headers), "payload": payload})
+        if not payload.get("stream"):
+            return self.send(200, "application/json", json.dumps({"content": [{"type": "text", "text": "ok"}], "usage": USAGE}).encode())
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.event({"type": "message_start", "message": {"usage": USAGE}})
+        time.sleep(GENERATION_SECONDS)
+        self.event({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "ok"}})
+        self.event({"type": "content_block_stop", "index": 0})
+        self.event({"type": "message_delta", "usage": {"output_tokens": 7}})
+        self.event({"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def event(self, event):
+        data = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    ProxyHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProxyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(main, "LLM_PROXY_URL", f"http://127.0.0.1:{server.server_port}/v1/messages")
+    monkeypatch.setattr(main, "LLM_CACHE_BYPASS", True)
+    monkeypatch.setattr(main, "PROMPT_CACHING", True)
+    monkeypatch.setattr(main, "llm_usage_stats", dict.fromkeys(main.llm_usage_stats, 0))
+    monkeypatch.setitem(main._provider_buckets, "llm_proxy", main.TokenBucket(rate=1000, burst=1000))
+    yield ProxyHandler.requests
+    server.shutdown()
+
+
+def test_shared_prefix_is_sent_as_a_cached_block(proxy, monkeypatch):
+    monkeypatch.setattr(main, "LLM_STREAMING", False)
+
+    assert main.call_llm_proxy("run specific part", cache_prefix="shared context") == "ok"
+
+    (request,) = proxy
+    assert request["headers"]["anthropic-beta"] == "prompt-caching-2024-07-31"
+    assert request["payload"]["messages"][0]["content"] == [
+        {"type": "text", "text": "shared context", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "run specific part"},
+    ]
+    assert main.llm_usage_stats == USAGE
+
+
+def test_other_runs_go_out_once_the_first_answer_has_begun(proxy, monkeypatch):
+    monkeypatch.setattr(main, "LLM_STREAMING", True)
+    warmup = main.PromptCacheWarmup()
+
+    def run(i):
+        return warmup.run(lambda on_start: main.call_llm_proxy("", cache_salt=f"run-{i}", cache_prefix="shared context", on_start=on_start))
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert list(executor.map(run, range(3))) == ["ok"] * 3
+
+    first, *others = sorted(request["at"] for request in proxy)
+    # The others neither went out with the first call nor waited for its whole generation
+    assert all(0 < at - first < GENERATION_SECONDS for at in others)
@@ -0,0 +1,59 @@
+import httpx
+import pytest
+
+errors = pytest.importorskip("asknews_sdk.errors")
+response_module = pytest.importorskip("asknews_sdk.response")
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    bucket = main.TokenBucket(rate=1000, burst=1000)
+    monkeypatch.setattr(bucket, "pause", lambda seconds: None)
+    monkeypatch.setitem(main._provider_buckets, "asknews", bucket)
+
+
+def asknews_error(error_class, status_code: int, headers: dict):
+    request = httpx.Request("GET", "https://api.asknews.app/v1/news/search")
+    response = response_module.APIResponse(request, status_code, headers, b"{}")
+    return error_class(response)
+
+
+def flaky(failures: list):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return "ok"
+
+    return call, calls
+
+
+def test_asknews_rate_limit_is_retried_after_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(main.time, "sleep", sleeps.append)
+    call, calls = flaky([asknews_error(errors.RateLimitExceededError, 429, {"retry-after": "7"})])
+
+    assert main.provider_call("asknews", call) == "ok"
+    assert len(calls) == 2
+    assert 7.0 in sleeps
+
+
+def test_asknews_transport_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(main.time, "sleep", lambda seconds: None)
+    call, calls = flaky([httpx.ConnectError("down"), asknews_error(errors.ServiceUnavailableError, 503, {})])
+
+    assert main.provider_call("asknews", call) == "ok"
+    assert len(calls) == 3
+
+
+def test_asknews_client_errors_are_not_retried(monkeypatch):
+    monkeypatch.setattr(main.time, "sleep", lambda seconds: None)
+    call, calls = flaky([asknews_error(errors.BadRequestError, 400, {})])
+
+    with pytest.raises(errors.BadRequestError):
+        main.provider_call("asknews", call)
+    assert len(calls) == 1
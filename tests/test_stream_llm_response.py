@@ -0,0 +1,63 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+TEXT = ["Prior: 25%\n", "Scenario A: 70%\n", "Probability: 4", "0%"]
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        events = [{"type": "message_start", "message": {"usage": {"input_tokens": 10}}}]
+        events += [{"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk}} for chunk in TEXT]
+        events += [
+            {"type": "content_block_stop", "index": 0},
+            {"type": "message_delta", "usage": {"output_tokens": 30}},
+            {"type": "message_stop"},
+        ]
+        body = "".join(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stream_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1/messages"
+    server.shutdown()
+
+
+def test_answer_is_taken_from_the_complete_text_while_the_slot_is_held(stream_url, monkeypatch):
+    slot = threading.BoundedSemaphore(1)
+    monkeypatch.setitem(main._provider_semaphores, "llm_proxy", slot)
+    answers = []
+
+    def on_answer(answer, text):
+        answers.append((answer, text, slot.acquire(blocking=False)))
+
+    response_data = main.stream_llm_response(
+        "llm_proxy",
+        stream_url,
+        {},
+        {"stream": True},
+        answer_extractor=main.extract_prediction_from_response_as_percentage_not_decimal,
+        on_answer=on_answer,
+    )
+
+    assert answers == [(40, "".join(TEXT), False)]
+    assert response_data["content"][0]["text"] == "".join(TEXT)
+    assert response_data["usage"] == {"input_tokens": 10, "output_tokens": 30}
+    assert slot.acquire(blocking=False)